@@ -14,17 +14,15 @@ import os
 import re
 from datetime import datetime, timedelta, timezone
 
-import firebase_admin
 from firebase_admin import auth as firebase_auth
 from firebase_functions import https_fn, options
-from google.cloud import secretmanager
 
-from src.config import load_config
+from src.config import get_secret_client, load_config
 from src import firestore_db
 from src.mail_handling.fetcher import EmailFetcher
 from src.mail_handling.parser import EmailParser
 from src.mail_handling.sender import EmailSender
-from src.crawl.crawler import WebCrawler
+from src.crawl.crawler import WebCrawler, normalize_url
 from src.summarize.processor import ContentProcessor
 from src.summarize.generator import SummaryGenerator
 
@@ -38,10 +36,29 @@ FUNCTION_TIMEOUT = 540
 FUNCTION_MAX_INSTANCES = 1
 
 
-def _generate_content_hash(subject: str, content: str) -> str:
-    """Deterministic hash for dedup based on subject + first 1000 chars of content."""
+def _plain_text_content(content: str, content_type: str) -> str:
+    """Return readable text for processed_content, stripping markup from HTML bodies."""
+    if content_type == "html" and len(content) > 500:
+        try:
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(content, "html.parser")
+            text = soup.get_text(separator="\n", strip=True)
+            if len(text) > 200:
+                return text
+        except Exception:
+            pass
+    return content
+
+
+def _generate_content_hash(subject: str, content: str) -> bytes:
+    """Deterministic hash for dedup based on subject + first 1000 chars of content.
+
+    Returns a raw 16-byte BLAKE2b digest; Firestore stores it as a bytes
+    value. Dedup needs no cryptographic strength, so 128 bits is plenty and
+    keeps the document field and its index entry small.
+    """
     payload = f"{subject}_{content[:1000]}"
-    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
 
 
 # ---------------------------------------------------------------------------
@@ -64,6 +81,7 @@ def fetch_and_process(req: https_fn.Request) -> https_fn.Response:
         logger.exception("Failed to load config")
         return https_fn.Response("Config error", status=500)
 
+    crawler = None
     try:
         fetcher = EmailFetcher(config["email"])
         parser = EmailParser()
@@ -71,7 +89,12 @@ def fetch_and_process(req: https_fn.Request) -> https_fn.Response:
 
         # 1. Fetch emails from IMAP
         logger.info("Connecting to IMAP and fetching emails...")
-        raw_emails = fetcher.fetch_new_emails()
+        # Everything inside the SINCE window that an earlier run stored is
+        # skipped before parsing; older UNSEEN mail is checked below.
+        recently_processed = firestore_db.get_recent_processed_email_ids(
+            days=max(config["email"]["initial_lookback_days"], 1) + 1
+        )
+        raw_emails = fetcher.fetch_new_emails(seen_message_ids=recently_processed)
 
         if not raw_emails:
             logger.info("No new emails found")
@@ -80,19 +103,24 @@ def fetch_and_process(req: https_fn.Request) -> https_fn.Response:
 
         logger.info("Fetched %d raw emails", len(raw_emails))
         processed_count = 0
+        processed_ids = firestore_db.get_processed_email_ids(
+            [email.get("message_id", "") for email in raw_emails]
+        )
 
+        # 2. Parse every new email first, so their content hashes can be
+        #    checked against Firestore in one batched query
+        pending = []
         for idx, email in enumerate(raw_emails):
             try:
                 message_id = email.get("message_id", "")
                 subject = email.get("subject", "No Subject")
-                logger.info("Processing %d/%d: %s", idx + 1, len(raw_emails), subject)
+                logger.info("Parsing %d/%d: %s", idx + 1, len(raw_emails), subject)
 
                 # Skip already-processed emails
-                if message_id and firestore_db.is_email_processed(message_id):
+                if message_id and message_id in processed_ids:
                     logger.info("Already processed, skipping: %s", message_id)
                     continue
 
-                # 2. Parse the email
                 parsed = parser.parse(email)
                 if not parsed:
                     logger.warning("Parser returned nothing for: %s", subject)
@@ -100,59 +128,114 @@ def fetch_and_process(req: https_fn.Request) -> https_fn.Response:
 
                 content = parsed.get("content", "")
                 content_type = parsed.get("content_type", "text")
-                links = parsed.get("links", [])
 
                 if not content:
                     logger.warning("No content after parsing: %s", subject)
                     continue
 
-                # 3. Store the processed email record
-                firestore_db.store_processed_email(
+                content_str = content if isinstance(content, str) else json.dumps(content)
+                clean_content = _plain_text_content(content_str, content_type)
+                pending.append({
+                    "email": email,
+                    "links": parsed.get("links", []),
+                    "content_type": content_type,
+                    "content_str": content_str,
+                    "clean_content": clean_content,
+                    "content_hash": _generate_content_hash(subject, clean_content),
+                })
+                if message_id:
+                    processed_ids.add(message_id)
+
+            except Exception:
+                logger.exception("Error parsing email: %s",
+                                 email.get("subject", "unknown"))
+
+        known_hashes = firestore_db.get_existing_content_hashes(
+            [item["content_hash"] for item in pending]
+        )
+
+        for item in pending:
+            email = item["email"]
+            try:
+                message_id = email.get("message_id", "")
+                subject = email.get("subject", "No Subject")
+                links = item["links"]
+                content_type = item["content_type"]
+                content_str = item["content_str"]
+                content_hash = item["content_hash"]
+
+                # Content an earlier email already carried is only recorded as
+                # processed: its links are neither stored nor crawled.
+                is_duplicate = content_hash in known_hashes
+                if is_duplicate:
+                    logger.info("Duplicate content hash, skipping: %s", subject)
+                    links = []
+
+                # 3. Store the processed email record, its content and its
+                #    extracted links in one batched write
+                #    (links that cannot be normalized are dropped)
+                normalized_urls = {}
+                for link in links:
+                    key = normalize_url(link["url"]) if link.get("url") else None
+                    if key:
+                        normalized_urls[link["url"]] = key
+                links = [link for link in links if link.get("url") in normalized_urls]
+                _, link_doc_ids = firestore_db.store_email(
                     message_id=message_id,
                     subject=subject,
                     sender=email.get("sender", ""),
                     date_received=email.get("date", datetime.now(timezone.utc)),
-                )
-
-                # 4. Store email content
-                content_str = content if isinstance(content, str) else json.dumps(content)
-                content_doc_id = firestore_db.store_email_content(
-                    email_message_id=message_id,
                     content_type=content_type,
                     content=content_str,
+                    links=[
+                        {"url": link["url"], "title": link.get("title", ""),
+                         "normalized_url": normalized_urls[link["url"]]}
+                        for link in links
+                    ],
                 )
+                if is_duplicate:
+                    continue
 
-                # 5. Store extracted links
-                for link in links:
-                    url = link.get("url", "")
-                    if url:
-                        firestore_db.store_link(
-                            content_doc_id=content_doc_id,
-                            url=url,
-                            title=link.get("title", ""),
-                        )
-
-                # 6. Crawl links
+                # 4. Crawl links that neither an earlier run nor this email
+                #    (via a tracking-parameter variant) has already covered
                 crawled_items = []
                 if links:
-                    crawled_items = crawler.crawl(links)
+                    seen = firestore_db.get_crawled_urls(list(normalized_urls.values()))
+                    to_crawl = []
+                    for link in links:
+                        key = normalized_urls.get(link.get("url"))
+                        if key in seen:
+                            continue
+                        if key:
+                            seen.add(key)
+                        to_crawl.append(link)
+                    if len(to_crawl) < len(links):
+                        logger.info("Skipping %d already-crawled links for: %s",
+                                    len(links) - len(to_crawl), subject)
+                    if to_crawl:
+                        crawler.preload_redirects(firestore_db.get_resolved_redirects(
+                            [link["url"] for link in to_crawl if link.get("url")]
+                        ))
+                        crawled_items = crawler.crawl(to_crawl)
+                        new_redirects = crawler.pop_new_redirects()
+                        if new_redirects:
+                            firestore_db.store_resolved_redirects(new_redirects)
                     logger.info("Crawled %d links for: %s", len(crawled_items), subject)
 
-                # 7. Build the processed content structure (matches old format)
-                clean_content = content_str
-                if content_type == "html" and len(content_str) > 500:
+                crawled_link_ids = [
+                    link_doc_ids[ci["original_url"]]
+                    for ci in crawled_items if ci.get("original_url") in link_doc_ids
+                ]
+                if crawled_link_ids:
                     try:
-                        from bs4 import BeautifulSoup
-                        soup = BeautifulSoup(content_str, "html.parser")
-                        text = soup.get_text(separator="\n", strip=True)
-                        if len(text) > 200:
-                            clean_content = text
+                        firestore_db.mark_links_crawled(crawled_link_ids)
                     except Exception:
-                        pass
+                        logger.exception("Error marking links crawled for: %s", subject)
 
+                # 5. Build the processed content structure (matches old format)
                 content_structure = {
                     "source": subject,
-                    "content": clean_content,
+                    "content": item["clean_content"],
                     "content_type": content_type,
                     "date": email.get("date", datetime.now(timezone.utc)).isoformat()
                     if isinstance(email.get("date"), datetime)
@@ -166,19 +249,14 @@ def fetch_and_process(req: https_fn.Request) -> https_fn.Response:
                         for ci in crawled_items if not ci.get("is_ad")
                     ]
 
-                content_hash = _generate_content_hash(subject, clean_content)
-
-                if firestore_db.content_hash_exists(content_hash):
-                    logger.info("Duplicate content hash, skipping: %s", subject)
-                    continue
-
                 firestore_db.store_processed_content(
                     email_message_id=message_id,
                     source=subject,
                     content_type=content_type,
-                    processed_content_json=json.dumps(content_structure),
+                    processed_content=content_structure,
                     content_hash=content_hash,
                 )
+                known_hashes.add(content_hash)
 
                 processed_count += 1
                 logger.info("Successfully processed: %s", subject)
@@ -198,6 +276,9 @@ def fetch_and_process(req: https_fn.Request) -> https_fn.Response:
     except Exception:
         logger.exception("Unhandled error in fetch_and_process")
         return https_fn.Response("Internal error", status=500)
+    finally:
+        if crawler is not None:
+            crawler.close()
 
 
 # ---------------------------------------------------------------------------
@@ -221,8 +302,11 @@ def _do_generate_and_send(config: dict) -> dict:
     doc_ids = []
     for item in raw_items:
         try:
-            pc_json = item.get("processed_content", "{}")
-            pc = json.loads(pc_json) if isinstance(pc_json, str) else pc_json
+            # Documents written before processed_content became a map hold
+            # a JSON string.
+            pc = item.get("processed_content") or {}
+            if isinstance(pc, str):
+                pc = json.loads(pc)
             pc["source"] = pc.get("source", item.get("source", "Unknown"))
             content_items.append(pc)
             doc_ids.append(item["id"])
@@ -296,18 +380,23 @@ def _do_generate_and_send(config: dict) -> dict:
 
     firestore_db.mark_content_summarized(doc_ids, summary_doc_id)
 
+    history_entries = []
     for item in deduplicated:
         try:
             title = processor._extract_content_title(item)
             content = item.get("content", "")
             fingerprint = processor._extract_meaningful_fingerprint(content)
-            content_hash = processor._generate_content_hash(item)
-            firestore_db.store_summarized_content_history(
-                content_hash=content_hash,
-                content_title=title[:255] if title else "",
-                content_fingerprint=fingerprint or "",
-                summary_doc_id=summary_doc_id,
-            )
+            history_entries.append({
+                "content_hash": processor._generate_content_hash(item),
+                "content_title": title[:255] if title else "",
+                "content_fingerprint": fingerprint or "",
+                "summary_doc_id": summary_doc_id,
+            })
+        except Exception:
+            logger.exception("Error building content history entry")
+    if history_entries:
+        try:
+            firestore_db.store_summarized_content_history(history_entries)
         except Exception:
             logger.exception("Error storing content history")
 
@@ -494,8 +583,7 @@ def _verify_caller(req: https_fn.Request) -> str | None:
 
     id_token = auth_header[7:]
     try:
-        if not firebase_admin._apps:
-            firebase_admin.initialize_app()
+        firestore_db.init_app()
         decoded = firebase_auth.verify_id_token(id_token)
         email = decoded.get("email", "")
         if email == AUTHORIZED_EMAIL:
@@ -637,7 +725,7 @@ def update_secrets(req: https_fn.Request) -> https_fn.Response:
             "GCLOUD_PROJECT",
             os.environ.get("GOOGLE_CLOUD_PROJECT", "lettermonstr"),
         )
-        client = secretmanager.SecretManagerServiceClient()
+        client = get_secret_client()
         parent = f"projects/{project_id}/secrets/{secret_id}"
         client.add_secret_version(
             request={"parent": parent, "payload": {"data": value.encode("utf-8")}},
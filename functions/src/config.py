@@ -6,6 +6,7 @@ from environment variables, producing a config dict matching
 the structure expected by all app modules.
 """
 
+import functools
 import logging
 import os
 
@@ -72,6 +73,16 @@ def _get_project_id() -> str:
     )
 
 
+@functools.lru_cache(maxsize=None)
+def get_secret_client() -> secretmanager.SecretManagerServiceClient:
+    """Return the process-wide Secret Manager client.
+
+    Building a client sets up credentials and a gRPC channel, so it is done
+    once per instance rather than on every config load or secret update.
+    """
+    return secretmanager.SecretManagerServiceClient()
+
+
 def _load_secret(client: secretmanager.SecretManagerServiceClient,
                  project_id: str, secret_id: str) -> str:
     name = f"projects/{project_id}/secrets/{secret_id}/versions/latest"
@@ -135,14 +146,9 @@ def _load_firestore_settings() -> dict | None:
     Only keys present in the known config schema are accepted.
     """
     try:
-        import firebase_admin
-        from firebase_admin import firestore as fb_firestore
-
-        if not firebase_admin._apps:
-            firebase_admin.initialize_app()
+        from src import firestore_db
 
-        db = fb_firestore.client()
-        doc = db.collection("settings").document("app_config").get()
+        doc = firestore_db.get_db().collection("settings").document("app_config").get()
         if doc.exists:
             data = doc.to_dict()
             data.pop("updated_at", None)
@@ -171,7 +177,7 @@ def _deep_merge(base: dict, override: dict) -> dict:
 
 def _load_secrets(config: dict) -> None:
     project_id = _get_project_id()
-    client = secretmanager.SecretManagerServiceClient()
+    client = get_secret_client()
 
     for secret_id, (section, key) in SECRET_NAMES.items():
         try:
@@ -5,16 +5,121 @@ Fetches and extracts content from newsletter links.
 No direct database access — the caller handles persistence via Firestore.
 """
 
+import hashlib
 import ipaddress
 import logging
+import re
 import socket
 import requests
+import threading
 import time
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import lxml.html
+from lxml import etree
+from charset_normalizer import from_bytes
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
 logger = logging.getLogger(__name__)
 
+# Pages are decoded to str by _fetch_page; re-encode as UTF-8 and tell libxml2
+# so, which also sidesteps lxml's refusal to parse str input that carries an
+# XML encoding declaration.
+_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+# Main-content candidates in priority order: first <article>, else first
+# <main>, else the first content/main/article id, else <body>. Each branch is
+# guarded by the absence of the earlier ones so the union yields one node.
+# Candidates inside page chrome are skipped, which lets _extract_content pick
+# the node first and strip unwanted tags from that subtree only.
+_NOT_CHROME = (
+    'not(ancestor-or-self::header or ancestor-or-self::footer'
+    ' or ancestor-or-self::nav or ancestor-or-self::aside)'
+)
+_ARTICLE = f'//article[{_NOT_CHROME}]'
+_MAIN = f'//main[{_NOT_CHROME}]'
+_ID_CANDIDATES = f'//*[@id="content" or @id="main" or @id="article"][{_NOT_CHROME}]'
+_MAIN_CONTENT_XPATH = etree.XPath(
+    f'({_ARTICLE})[1]'
+    f' | ({_MAIN}[not({_ARTICLE})])[1]'
+    f' | ({_ID_CANDIDATES}[not({_ARTICLE} | {_MAIN})])[1]'
+    f' | /html/body[not({_ARTICLE} | {_MAIN} | {_ID_CANDIDATES})]'
+)
+_UNWANTED_TAGS = ('script', 'style', 'header', 'footer', 'nav', 'aside')
+
+_BASE_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+MAX_CRAWL_WORKERS = 8
+# Keep-alive pool per host; sized so every crawl worker can hold a connection
+# to the same newsletter platform without blocking on the pool.
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 32
+# Pages are streamed and abandoned past this size or when they are not HTML,
+# so a linked PDF or video never gets buffered and handed to the parser.
+MAX_RESPONSE_BYTES = 2 * 1024 * 1024
+HTML_CONTENT_TYPES = frozenset({'text/html', 'application/xhtml+xml'})
+PER_HOST_DELAY_SECONDS = 1.0
+# Concurrent redirect-resolving HEADs allowed per host. Most newsletter links
+# share one click-tracking host, which would otherwise take every worker.
+MAX_HEADS_PER_HOST = 2
+
+# Digits and whitespace are dropped from a page's extracted text before
+# hashing, so the same article served with different timestamps or counters
+# hashes alike.
+_DIGITS_WS_RE = re.compile(r'[\d\s]+')
+
+TRACKING_QUERY_PARAMS = frozenset({
+    'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'referrer',
+})
+
+ROOT_PATHS = frozenset({'', '/', '/index.html', '/index.php', '/home'})
+
+
+# Newsletter/tracking hosts whose near-empty paths never lead to an article.
+# Matched as substrings of the netloc, so subdomains are covered.
+PROBLEMATIC_DOMAINS = (
+    'beehiiv.com', 'mailchimp.com', 'substack.com', 'bytebytego.com',
+    'sciencealert.com', 'leapfin.com', 'cutt.ly', 'genai.works',
+)
+_PROBLEMATIC_DOMAIN_RE = re.compile('|'.join(re.escape(d) for d in PROBLEMATIC_DOMAINS))
+
+
+def _is_root_path(path):
+    """True if *path* is a site root rather than a specific piece of content."""
+    return path.lower() in ROOT_PATHS
+
+
+def _is_tracking_param(key):
+    return key.startswith('utm_') or key in TRACKING_QUERY_PARAMS
+
+
+def normalize_url(url):
+    """Canonical form of *url* used as the crawled-link dedup key.
+
+    Lowercases scheme and host, drops a leading ``www.``, the fragment,
+    ``utm_*`` and other tracking parameters, and any trailing slash.
+    Returns None for a URL urlparse rejects, such as a broken IPv6 host.
+    """
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return None
+    netloc = parsed.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    query = urlencode([
+        (key, value)
+        for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _is_tracking_param(key.lower())
+    ])
+    path = parsed.path.rstrip('/')
+    return urlunparse((parsed.scheme.lower(), netloc, path, parsed.params, query, ''))
+
 
 class WebCrawler:
     """Fetches and extracts content from links."""
@@ -30,13 +135,41 @@ class WebCrawler:
         self.user_agent = config['user_agent']
         self.timeout = config['request_timeout']
         self.ad_keywords = config['ad_keywords']
-        self.headers = {
-            'User-Agent': self.user_agent,
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
+        # One case-insensitive alternation scans the page once instead of
+        # lowercasing it and running a substring search per keyword.
+        keywords = [k for k in self.ad_keywords if k]
+        self._ad_keyword_re = (
+            re.compile('|'.join(re.escape(k) for k in keywords), re.IGNORECASE)
+            if keywords else None
+        )
+        self.headers = {'User-Agent': self.user_agent, **_BASE_HEADERS}
+        self._session = self._build_session()
+        self._host_lock = threading.Lock()
+        self._next_host_slot = {}
+        self._head_semaphores = {}
+        self._seen_lock = threading.Lock()
+        self._seen_page_digests = set()
+        # url -> resolved url; preload_redirects seeds it from earlier runs and
+        # _new_redirects tracks what this run resolved for the caller to persist.
+        self._redirects = {}
+        self._new_redirects = {}
+
+    def _build_session(self):
+        """Create a pooled HTTP session so repeat hosts reuse TCP/TLS connections."""
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=Retry(total=2, backoff_factor=0.5),
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        """Release pooled HTTP connections."""
+        self._session.close()
 
     def crawl(self, links, depth=0):
         """Crawl the provided links and extract content.
@@ -46,7 +179,7 @@ class WebCrawler:
             depth: Current crawl depth (for recursive crawling).
 
         Returns:
-            list[dict]: Each dict has keys: url, title, content, is_ad.
+            list[dict]: Each dict has keys: url, original_url, title, content, is_ad.
         """
         if not links:
             return []
@@ -69,52 +202,112 @@ class WebCrawler:
         crawled_content = []
 
         try:
-            for link_data in links:
-                if not isinstance(link_data, dict) or 'url' not in link_data:
-                    logger.warning(f"Invalid link data, skipping: {link_data}")
-                    continue
+            workers = min(MAX_CRAWL_WORKERS, len(links)) or 1
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for item in executor.map(self._crawl_one, links):
+                    if item:
+                        crawled_content.append(item)
 
-                url = link_data['url']
+            return crawled_content
 
-                if not url.lower().startswith(('http://', 'https://')):
-                    logger.warning(f"Skipping non-HTTP URL: {url}")
-                    continue
+        except Exception as e:
+            logger.error(f"Error in crawl process: {e}", exc_info=True)
+            return crawled_content
+
+    def _crawl_one(self, link_data):
+        """Fetch and extract a single link. Returns a crawled-content dict or None.
+
+        Runs on a worker thread; network I/O and lxml parsing both release the GIL.
+        """
+        try:
+            if not isinstance(link_data, dict) or 'url' not in link_data:
+                logger.warning(f"Invalid link data, skipping: {link_data}")
+                return None
 
-                if not self._is_safe_url(url):
-                    continue
+            url = link_data['url']
 
-                logger.info(f"Crawling URL: {url}")
-                page_content = self._fetch_page(url)
+            if not url.lower().startswith(('http://', 'https://')):
+                logger.warning(f"Skipping non-HTTP URL: {url}")
+                return None
 
-                if not page_content:
-                    logger.warning(f"No content fetched from URL: {url}")
-                    continue
+            if not self._is_safe_url(url):
+                return None
 
-                extracted_content = self._extract_content(url, page_content)
+            self._wait_for_host(url)
 
-                if not extracted_content or not extracted_content.get('clean_text'):
-                    logger.warning(f"No meaningful content extracted from URL: {url}")
-                    continue
+            logger.info(f"Crawling URL: {url}")
+            page_content = self._fetch_page(url)
 
-                is_ad = self._is_advertisement(extracted_content)
-                if is_ad:
-                    logger.info(f"Content from {url} appears to be an advertisement, skipping")
-                    continue
+            if not page_content:
+                logger.warning(f"No content fetched from URL: {url}")
+                return None
 
-                crawled_content.append({
-                    'url': url,
-                    'title': extracted_content['title'],
-                    'content': extracted_content['clean_text'],
-                    'is_ad': is_ad,
-                })
+            extracted_content = self._extract_content(url, page_content)
 
-                time.sleep(1)
+            if not extracted_content or not extracted_content.get('clean_text'):
+                logger.warning(f"No meaningful content extracted from URL: {url}")
+                return None
 
-            return crawled_content
+            if self._is_duplicate_page(extracted_content['clean_text']):
+                logger.info(f"Content from {url} duplicates an already-crawled page, skipping")
+                return None
+
+            is_ad = self._is_advertisement(extracted_content)
+            if is_ad:
+                logger.info(f"Content from {url} appears to be an advertisement, skipping")
+                return None
+
+            return {
+                'url': url,
+                'original_url': link_data.get('original_url') or url,
+                'title': extracted_content['title'],
+                'content': extracted_content['clean_text'],
+                'is_ad': is_ad,
+            }
 
         except Exception as e:
-            logger.error(f"Error in crawl process: {e}", exc_info=True)
-            return crawled_content
+            logger.error(f"Error crawling {link_data}: {e}", exc_info=True)
+            return None
+
+    def _is_duplicate_page(self, clean_text):
+        """Return True if an equivalent page was already crawled by this crawler.
+
+        Newsletters often link one article through several tracking URLs.
+        Hashing the extracted main-content text (no markup, scripts or page
+        chrome) catches those, while different pages on one site template
+        still hash apart.
+        """
+        text = _DIGITS_WS_RE.sub(' ', clean_text).lower()
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self._seen_lock:
+            if digest in self._seen_page_digests:
+                return True
+            self._seen_page_digests.add(digest)
+        return False
+
+    def _wait_for_host(self, url):
+        """Space out requests to the same host by PER_HOST_DELAY_SECONDS.
+
+        Each caller reserves the next free slot for its host under the lock and
+        then sleeps outside it, so different hosts are fetched in parallel.
+        """
+        host = (urlparse(url).hostname or '').lower()
+        with self._host_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_host_slot.get(host, now))
+            self._next_host_slot[host] = slot + PER_HOST_DELAY_SECONDS
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _head_semaphore(self, url):
+        """Return the semaphore capping concurrent HEADs to *url*'s host."""
+        host = (urlparse(url).hostname or '').lower()
+        with self._host_lock:
+            semaphore = self._head_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(MAX_HEADS_PER_HOST)
+                self._head_semaphores[host] = semaphore
+        return semaphore
 
     # ------------------------------------------------------------------
     # URL safety
@@ -165,42 +358,89 @@ class WebCrawler:
     # ------------------------------------------------------------------
 
     def _fetch_page(self, url):
-        """Fetch a web page and return its HTML content."""
+        """Fetch a web page and return its HTML content.
+
+        Returns None for non-HTML responses and bodies over MAX_RESPONSE_BYTES.
+        """
         try:
             logger.info(f"Fetching URL: {url}")
-            response = requests.get(url, headers=self.headers, timeout=self.timeout)
+            with self._session.get(url, timeout=self.timeout, stream=True) as response:
+                if response.status_code != 200:
+                    logger.warning(f"Failed to fetch URL: {url} (Status code: {response.status_code})")
+                    return None
 
-            if response.status_code == 200:
-                return response.text
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type and content_type not in HTML_CONTENT_TYPES:
+                    logger.info(f"Skipping non-HTML content ({content_type}): {url}")
+                    return None
 
-            logger.warning(f"Failed to fetch URL: {url} (Status code: {response.status_code})")
-            return None
+                raw = self._read_capped(response)
+                if raw is None:
+                    logger.info(f"Skipping page larger than {MAX_RESPONSE_BYTES} bytes: {url}")
+                    return None
+
+                return self._decode_body(response, raw)
 
         except Exception as e:
             logger.error(f"Error fetching page {url}: {e}", exc_info=True)
             return None
 
+    def _read_capped(self, response):
+        """Read a streamed body, returning None once it exceeds MAX_RESPONSE_BYTES."""
+        chunks = []
+        total = 0
+        for chunk in response.iter_content(65536):
+            total += len(chunk)
+            if total > MAX_RESPONSE_BYTES:
+                return None
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def _decode_body(self, response, raw):
+        """Decode a response body, running charset detection only as a last resort.
+
+        ``response.text`` runs charset detection over the whole body whenever
+        the server omits a charset. Most pages are UTF-8 or declare their
+        charset, so try that first and only detect when the decode fails.
+        """
+        content_type = response.headers.get('Content-Type', '')
+        encoding = response.encoding if 'charset' in content_type.lower() else 'utf-8'
+
+        try:
+            return raw.decode(encoding or 'utf-8')
+        except (UnicodeDecodeError, LookupError):
+            pass
+
+        best = from_bytes(raw).best()
+        if best is not None:
+            return str(best)
+        return raw.decode('utf-8', errors='replace')
+
+    def preload_redirects(self, redirects):
+        """Seed the redirect cache with url -> resolved url mappings."""
+        self._redirects.update(redirects)
+
+    def pop_new_redirects(self):
+        """Return redirects resolved since the last call, for persisting."""
+        new, self._new_redirects = self._new_redirects, {}
+        return new
+
     def resolve_redirect(self, url):
         """Follow redirects to get the actual destination URL."""
         try:
             if not url.lower().startswith(('http://', 'https://')):
                 return url
 
+            cached = self._redirects.get(url)
+            if cached:
+                return cached
+
             parsed_url = urlparse(url)
-            if not parsed_url.path or parsed_url.path == '/' or parsed_url.path.lower() in ['/index.html', '/index.php', '/home']:
+            if _is_root_path(parsed_url.path):
                 logger.info(f"Skipping root domain URL without specific content path: {url}")
                 return None
 
-            problematic_domains = [
-                'beehiiv.com', 'media.beehiiv.com', 'link.mail.beehiiv.com',
-                'mailchimp.com', 'substack.com', 'bytebytego.com',
-                'sciencealert.com', 'leapfin.com', 'cutt.ly',
-                'genai.works', 'link.genai.works',
-            ]
-
-            if any(domain in parsed_url.netloc.lower() for domain in problematic_domains) and (
-                not parsed_url.path or parsed_url.path == '/' or len(parsed_url.path) < 5
-            ):
+            if len(parsed_url.path) < 5 and _PROBLEMATIC_DOMAIN_RE.search(parsed_url.netloc.lower()):
                 logger.info(f"Skipping known newsletter/tracking domain without specific content: {url}")
                 return None
 
@@ -208,7 +448,8 @@ class WebCrawler:
                 return None
 
             logger.info(f"Resolving URL: {url}")
-            head_response = requests.head(url, headers=self.headers, allow_redirects=True, timeout=self.timeout)
+            with self._head_semaphore(url):
+                head_response = self._session.head(url, allow_redirects=True, timeout=self.timeout)
             final_url = head_response.url
 
             if final_url != url:
@@ -218,10 +459,17 @@ class WebCrawler:
                     return None
 
                 final_parsed = urlparse(final_url)
-                if not final_parsed.path or final_parsed.path == '/' or final_parsed.path.lower() in ['/index.html', '/index.php', '/home']:
+                if _is_root_path(final_parsed.path):
                     logger.info(f"Redirect ended at root domain without specific content: {final_url}")
                     return None
 
+                # Only a successfully followed redirect is worth caching:
+                # tracking links are mostly unique per send, so caching
+                # non-redirects and errors would cost a write per link per run.
+                if head_response.ok:
+                    self._redirects[url] = final_url
+                    self._new_redirects[url] = final_url
+
             return final_url
 
         except Exception as e:
@@ -237,36 +485,42 @@ class WebCrawler:
         Returns:
             list[dict]: Dicts with resolved 'url', 'title', and optional 'original_url'.
         """
-        result = []
+        candidates = []
 
         for link in links:
-            try:
-                if isinstance(link, dict) and 'url' in link:
-                    url = link['url']
-                    title = link.get('title', '')
-                elif isinstance(link, str):
-                    url = link
-                    title = ''
-                else:
-                    logger.warning(f"Invalid link format: {link}")
-                    continue
-
-                if not url.lower().startswith(('http://', 'https://')):
-                    continue
-
-                resolved_url = self.resolve_redirect(url)
-
-                if not resolved_url:
-                    continue
-
-                result.append({
-                    'url': resolved_url,
-                    'title': title,
-                    'original_url': url if resolved_url != url else None,
-                })
-
-            except Exception as e:
-                logger.error(f"Error processing link {link}: {e}", exc_info=True)
+            if isinstance(link, dict) and 'url' in link:
+                url = link['url']
+                title = link.get('title', '')
+            elif isinstance(link, str):
+                url = link
+                title = ''
+            else:
+                logger.warning(f"Invalid link format: {link}")
+                continue
+
+            if not isinstance(url, str) or not url.lower().startswith(('http://', 'https://')):
+                continue
+
+            candidates.append((url, title))
+
+        if not candidates:
+            return []
+
+        # HEAD requests are pure network wait, so resolve them concurrently.
+        workers = min(MAX_CRAWL_WORKERS, len(candidates))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            resolved = list(executor.map(self.resolve_redirect, [url for url, _ in candidates]))
+
+        result = []
+        for (url, title), resolved_url in zip(candidates, resolved):
+            if not resolved_url:
+                continue
+
+            result.append({
+                'url': resolved_url,
+                'title': title,
+                'original_url': url if resolved_url != url else None,
+            })
 
         return result
 
@@ -277,31 +531,30 @@ class WebCrawler:
     def _extract_content(self, url, html_content):
         """Extract structured content from raw HTML."""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            root = lxml.html.document_fromstring(
+                html_content.encode('utf-8'), parser=_HTML_PARSER
+            )
 
-            title = self._extract_title(soup)
+            title = self._extract_title(root)
 
             meta_desc = ''
-            meta_tag = soup.find('meta', attrs={'name': 'description'})
-            if meta_tag and 'content' in meta_tag.attrs:
-                meta_desc = meta_tag['content']
+            meta_tag = root.find('.//meta[@name="description"]')
+            if meta_tag is not None:
+                meta_desc = meta_tag.get('content', '')
 
-            for tag in soup(['script', 'style', 'header', 'footer', 'nav', 'aside']):
-                tag.decompose()
+            main_content = next(iter(_MAIN_CONTENT_XPATH(root)), None)
 
-            article = soup.find('article')
-            if article:
-                main_content = article
-            else:
-                main_content = soup.find('main') or soup.find(id=['content', 'main', 'article']) or soup.body
-
-            clean_text = self._clean_text(main_content.get_text(' ', strip=True)) if main_content else ''
+            clean_text = ''
+            if main_content is not None:
+                for tag in list(main_content.iter(*_UNWANTED_TAGS)):
+                    tag.drop_tree()
+                clean_text = self._clean_text(' '.join(main_content.itertext()))
 
             return {
                 'url': url,
                 'title': title,
                 'description': meta_desc,
-                'raw_html': str(soup),
+                'raw_html': html_content,
                 'clean_text': clean_text,
             }
 
@@ -315,22 +568,22 @@ class WebCrawler:
                 'clean_text': '',
             }
 
-    def _extract_title(self, soup):
-        """Extract the best available title from a BeautifulSoup object."""
-        if not soup:
+    def _extract_title(self, root):
+        """Extract the best available title from a parsed lxml document."""
+        if root is None:
             return ""
 
-        title_tag = soup.find('title')
-        if title_tag and title_tag.text:
-            return title_tag.text.strip()
+        title_tag = root.find('.//title')
+        if title_tag is not None and title_tag.text_content().strip():
+            return title_tag.text_content().strip()
 
-        h1_tag = soup.find('h1')
-        if h1_tag and h1_tag.text:
-            return h1_tag.text.strip()
+        h1_tag = root.find('.//h1')
+        if h1_tag is not None and h1_tag.text_content().strip():
+            return h1_tag.text_content().strip()
 
-        meta_title = soup.find('meta', property='og:title')
-        if meta_title and meta_title.get('content'):
-            return meta_title['content'].strip()
+        meta_title = root.find('.//meta[@property="og:title"]')
+        if meta_title is not None and meta_title.get('content'):
+            return meta_title.get('content').strip()
 
         return ""
 
@@ -352,10 +605,15 @@ class WebCrawler:
             description = content.get('description', '') or ''
             clean_text = content.get('clean_text', '') or ''
 
-            lower_content = (title + ' ' + description + ' ' + clean_text).lower()
+            if self._ad_keyword_re is None:
+                return False
 
-            for keyword in self.ad_keywords:
-                if keyword.lower() in lower_content:
+            # Most ad markers sit in the title or meta description, so check
+            # those before scanning the (much larger) body text.
+            for field in (title, description, clean_text):
+                match = self._ad_keyword_re.search(field)
+                if match:
+                    keyword = match.group(0).lower()
                     logger.info(f"Identified advertisement content: {content.get('url', '')} (matched keyword: {keyword})")
                     return True
         except Exception as e:
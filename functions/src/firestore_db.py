@@ -4,7 +4,10 @@ Replaces the SQLAlchemy/SQLite models with Firestore collections
 for use in Firebase Cloud Functions.
 """
 
+import hashlib
 import logging
+import zlib
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 
 import firebase_admin
@@ -14,24 +17,48 @@ from google.cloud import firestore
 logger = logging.getLogger(__name__)
 
 _db: firestore.Client | None = None
+# processed_content hashes this instance has stored or seen stored, oldest
+# first; a hit answers get_existing_content_hashes without a query. Warm
+# instances carry it across invocations, so it is capped at
+# KNOWN_CONTENT_HASHES_MAX entries.
+_known_content_hashes: OrderedDict[bytes, None] = OrderedDict()
+KNOWN_CONTENT_HASHES_MAX = 10_000
 
 PROCESSED_EMAILS = "processed_emails"
 EMAIL_CONTENTS = "email_contents"
 LINKS = "links"
-CRAWLED_CONTENTS = "crawled_contents"
 PROCESSED_CONTENT = "processed_content"
 SUMMARIES = "summaries"
 SUMMARIZED_CONTENT_HISTORY = "summarized_content_history"
+RESOLVED_REDIRECTS = "resolved_redirects"
 
+# Newsletter shortlinks redirect deterministically, so a resolution stays
+# valid long enough to span a week of runs.
+REDIRECT_CACHE_TTL_DAYS = 7
+
+# Firestore caps the number of values in an ``in`` filter and the number of
+# writes in a single batch.
+FIRESTORE_IN_QUERY_LIMIT = 30
+FIRESTORE_BATCH_LIMIT = 500
+
+# Text bodies longer than this are zlib-compressed before storage; below it
+# the compression header outweighs the savings.
+COMPRESS_MIN_CHARS = 512
 
-def init_firestore() -> firestore.Client:
-    """Initialize Firebase Admin SDK and return a Firestore client.
+
+def init_app() -> None:
+    """Initialize the default Firebase Admin app once per process.
 
     Uses Application Default Credentials (auto-detected in Cloud Functions).
     """
-    global _db
     if not firebase_admin._apps:
         firebase_admin.initialize_app()
+
+
+def init_firestore() -> firestore.Client:
+    """Initialize Firebase Admin SDK and return a Firestore client."""
+    global _db
+    init_app()
     _db = firebase_firestore.client()
     return _db
 
@@ -43,144 +70,277 @@ def get_db() -> firestore.Client:
     return _db
 
 
+class _ChunkedBatch:
+    """WriteBatch wrapper that commits every FIRESTORE_BATCH_LIMIT writes.
+
+    Firestore rejects batches larger than 500 writes; callers queue writes
+    with set()/update() and call commit() once at the end.
+    """
+
+    def __init__(self, db: firestore.Client):
+        self._db = db
+        self._batch = db.batch()
+        self._pending = 0
+
+    def set(self, ref, data: dict, merge: bool = False) -> None:
+        self._batch.set(ref, data, merge=merge)
+        self._written()
+
+    def update(self, ref, data: dict) -> None:
+        self._batch.update(ref, data)
+        self._written()
+
+    def commit(self) -> None:
+        if self._pending:
+            self._batch.commit()
+            self._batch = self._db.batch()
+            self._pending = 0
+
+    def _written(self) -> None:
+        self._pending += 1
+        if self._pending >= FIRESTORE_BATCH_LIMIT:
+            self.commit()
+
+
+def pack_text(text: str) -> str | bytes:
+    """Compress a large text body for storage.
+
+    Returns *text* unchanged when short; otherwise zlib-compressed UTF-8
+    bytes, which Firestore stores as a bytes value. The value's type tells
+    unpack_text which form it holds.
+    """
+    if len(text) <= COMPRESS_MIN_CHARS:
+        return text
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def unpack_text(value: str | bytes | None) -> str:
+    """Inverse of pack_text; also accepts plain strings written before compression."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value or ""
+
+
 # ---------------------------------------------------------------------------
 # Processed Emails
 # ---------------------------------------------------------------------------
 
-def is_email_processed(message_id: str) -> bool:
-    """Check whether an email with the given message_id has already been processed."""
+def get_processed_email_ids(message_ids: list[str]) -> set[str]:
+    """Return the subset of *message_ids* that have already been processed.
+
+    Reads every processed_emails document in one batched get_all call
+    instead of one round trip per email.
+    """
+    unique = list(dict.fromkeys(m for m in message_ids if m))
+    if not unique:
+        return set()
     try:
-        doc = get_db().collection(PROCESSED_EMAILS).document(message_id).get()
-        return doc.exists
+        db = get_db()
+        collection = db.collection(PROCESSED_EMAILS)
+        docs = db.get_all([collection.document(m) for m in unique])
+        return {d.id for d in docs if d.exists}
     except Exception:
-        logger.exception("Error checking if email is processed: %s", message_id)
-        return False
+        logger.exception("Error checking processed emails")
+        return set()
+
 
+def get_recent_processed_email_ids(days: int) -> set[str]:
+    """Return message_ids of emails processed within the last *days* days.
 
-def store_processed_email(
+    One projected query that returns only the message_id field, so callers
+    can skip already-processed messages before parsing them.
+    """
+    try:
+        threshold = datetime.now(timezone.utc) - timedelta(days=days)
+        docs = (
+            get_db()
+            .collection(PROCESSED_EMAILS)
+            .where("date_processed", ">=", threshold)
+            .select(["message_id"])
+            .get()
+        )
+        return {d.id for d in docs}
+    except Exception:
+        logger.exception("Error fetching recently processed emails")
+        return set()
+
+
+def url_hash(url: str) -> str:
+    """Return the fixed-width crawled-link dedup key for a normalized URL.
+
+    Tracking-laden URLs can run to hundreds of bytes; a 64-bit BLAKE2b digest
+    keeps the indexed field and the ``in`` query values small.
+    """
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def store_email(
     message_id: str,
     subject: str,
     sender: str,
     date_received: datetime,
-) -> str:
-    """Create or update a processed-email record. Returns the message_id."""
+    content_type: str,
+    content: str,
+    links: list[dict],
+) -> tuple[str, dict[str, str]]:
+    """Store one email's processed record, body and extracted links in a single batch.
+
+    The processed_emails document is keyed by message_id and merged. The
+    body is compressed with pack_text (read it back with unpack_text). Each
+    link dict carries ``url``, ``title`` and ``normalized_url``; the latter's
+    url_hash is the crawled-link dedup key queried by get_crawled_urls.
+
+    Returns (email content document ID, mapping of url to link document ID).
+    """
     try:
-        get_db().collection(PROCESSED_EMAILS).document(message_id).set(
-            {
-                "message_id": message_id,
-                "subject": subject,
-                "sender": sender,
-                "date_received": date_received,
-                "date_processed": firestore.SERVER_TIMESTAMP,
-            },
-            merge=True,
-        )
-        return message_id
+        db = get_db()
+        batch = _ChunkedBatch(db)
+        batch.set(db.collection(PROCESSED_EMAILS).document(message_id), {
+            "message_id": message_id,
+            "subject": subject,
+            "sender": sender,
+            "date_received": date_received,
+            "date_processed": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+
+        content_ref = db.collection(EMAIL_CONTENTS).document()
+        batch.set(content_ref, {
+            "email_message_id": message_id,
+            "content_type": content_type,
+            "content": pack_text(content),
+            "date_stored": firestore.SERVER_TIMESTAMP,
+        })
+
+        links_collection = db.collection(LINKS)
+        link_doc_ids: dict[str, str] = {}
+        for link in links:
+            ref = links_collection.document()
+            normalized_url = link.get("normalized_url") or link["url"]
+            batch.set(ref, {
+                "content_doc_id": content_ref.id,
+                "url": link["url"],
+                "normalized_url": normalized_url,
+                "url_hash": url_hash(normalized_url),
+                "title": link.get("title"),
+                "crawled": False,
+                "date_found": firestore.SERVER_TIMESTAMP,
+            })
+            link_doc_ids[link["url"]] = ref.id
+
+        batch.commit()
+        return content_ref.id, link_doc_ids
     except Exception:
-        logger.exception("Error storing processed email: %s", message_id)
+        logger.exception("Error storing email: %s", message_id)
         raise
 
 
 # ---------------------------------------------------------------------------
-# Email Contents
+# Links
 # ---------------------------------------------------------------------------
 
-def store_email_content(
-    email_message_id: str,
-    content_type: str,
-    content: str,
-) -> str:
-    """Store the body/content of an email. Returns the new document ID."""
+def get_crawled_urls(normalized_urls: list[str]) -> set[str]:
+    """Return the subset of *normalized_urls* whose links have already been crawled.
+
+    Issues one ``in`` query on url_hash per FIRESTORE_IN_QUERY_LIMIT URLs
+    instead of one query per URL; the stored normalized_url is compared to
+    rule out hash collisions.
+    """
+    crawled: set[str] = set()
+    by_hash = {url_hash(u): u for u in normalized_urls if u}
+    hashes = list(by_hash)
     try:
-        _, doc_ref = get_db().collection(EMAIL_CONTENTS).add(
-            {
-                "email_message_id": email_message_id,
-                "content_type": content_type,
-                "content": content,
-                "date_stored": firestore.SERVER_TIMESTAMP,
-            }
-        )
-        return doc_ref.id
+        collection = get_db().collection(LINKS)
+        for start in range(0, len(hashes), FIRESTORE_IN_QUERY_LIMIT):
+            chunk = hashes[start:start + FIRESTORE_IN_QUERY_LIMIT]
+            docs = (
+                collection
+                .where("url_hash", "in", chunk)
+                .where("crawled", "==", True)
+                .get()
+            )
+            for d in docs:
+                data = d.to_dict()
+                if by_hash.get(data.get("url_hash")) == data.get("normalized_url"):
+                    crawled.add(data["normalized_url"])
     except Exception:
-        logger.exception("Error storing email content for: %s", email_message_id)
-        raise
+        logger.exception("Error checking crawled URLs")
+    return crawled
 
 
 # ---------------------------------------------------------------------------
-# Links
+# Resolved Redirects
 # ---------------------------------------------------------------------------
 
-def store_link(content_doc_id: str, url: str, title: str | None = None) -> str:
-    """Store a link extracted from email content. Returns the new document ID."""
+def _redirect_doc_id(url: str) -> str:
+    """URLs contain '/', which Firestore forbids in document IDs."""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def get_resolved_redirects(urls: list[str]) -> dict[str, str]:
+    """Return cached redirect targets for *urls* resolved within the TTL.
+
+    Reads every document in one batched get_all call.
+    """
+    unique = list(dict.fromkeys(u for u in urls if u))
+    if not unique:
+        return {}
     try:
-        _, doc_ref = get_db().collection(LINKS).add(
-            {
-                "content_doc_id": content_doc_id,
-                "url": url,
-                "title": title,
-                "crawled": False,
-                "date_found": firestore.SERVER_TIMESTAMP,
-            }
-        )
-        return doc_ref.id
+        db = get_db()
+        collection = db.collection(RESOLVED_REDIRECTS)
+        threshold = datetime.now(timezone.utc) - timedelta(days=REDIRECT_CACHE_TTL_DAYS)
+        redirects: dict[str, str] = {}
+        for doc in db.get_all([collection.document(_redirect_doc_id(u)) for u in unique]):
+            if not doc.exists:
+                continue
+            data = doc.to_dict()
+            resolved_at = data.get("resolved_at")
+            if resolved_at and resolved_at >= threshold:
+                redirects[data["url"]] = data["resolved_url"]
+        return redirects
     except Exception:
-        logger.exception("Error storing link: %s", url)
-        raise
+        logger.exception("Error reading resolved redirects")
+        return {}
 
 
-def is_url_crawled(url: str) -> bool:
-    """Check whether the given URL has already been crawled."""
+def store_resolved_redirects(redirects: dict[str, str]) -> None:
+    """Persist url -> resolved url mappings so later runs can skip the HEAD request."""
     try:
-        docs = (
-            get_db()
-            .collection(LINKS)
-            .where("url", "==", url)
-            .where("crawled", "==", True)
-            .limit(1)
-            .get()
-        )
-        return len(docs) > 0
+        db = get_db()
+        collection = db.collection(RESOLVED_REDIRECTS)
+        batch = _ChunkedBatch(db)
+        for url, resolved_url in redirects.items():
+            batch.set(collection.document(_redirect_doc_id(url)), {
+                "url": url,
+                "resolved_url": resolved_url,
+                "resolved_at": firestore.SERVER_TIMESTAMP,
+            })
+        batch.commit()
     except Exception:
-        logger.exception("Error checking if URL is crawled: %s", url)
-        return False
+        logger.exception("Error storing resolved redirects")
 
 
 # ---------------------------------------------------------------------------
 # Crawled Contents
 # ---------------------------------------------------------------------------
 
-def store_crawled_content(
-    link_doc_id: str,
-    title: str | None,
-    content: str,
-    clean_content: str,
-    is_ad: bool = False,
-) -> str:
-    """Store crawled page content and mark the parent link as crawled.
+def mark_links_crawled(link_doc_ids: list[str]) -> None:
+    """Batch-update link documents to mark them as crawled.
 
-    Returns the new crawled-content document ID.
+    The crawled text itself lives in processed_content.articles, the only
+    place it is read from, so no separate page document is written.
     """
     try:
         db = get_db()
-        _, doc_ref = db.collection(CRAWLED_CONTENTS).add(
-            {
-                "link_doc_id": link_doc_id,
-                "title": title,
-                "content": content,
-                "clean_content": clean_content,
-                "is_ad": is_ad,
-                "date_crawled": firestore.SERVER_TIMESTAMP,
-            }
-        )
-        db.collection(LINKS).document(link_doc_id).update(
-            {
+        collection = db.collection(LINKS)
+        batch = _ChunkedBatch(db)
+        for doc_id in link_doc_ids:
+            batch.update(collection.document(doc_id), {
                 "crawled": True,
                 "date_crawled": firestore.SERVER_TIMESTAMP,
-            }
-        )
-        return doc_ref.id
+            })
+        batch.commit()
     except Exception:
-        logger.exception("Error storing crawled content for link: %s", link_doc_id)
+        logger.exception("Error marking links as crawled")
         raise
 
 
@@ -192,22 +352,28 @@ def store_processed_content(
     email_message_id: str,
     source: str,
     content_type: str,
-    processed_content_json: str,
-    content_hash: str,
+    processed_content: dict,
+    content_hash: bytes,
 ) -> str:
-    """Store processed (cleaned/structured) content. Returns the new document ID."""
+    """Store processed (cleaned/structured) content. Returns the new document ID.
+
+    *processed_content* is stored as a native Firestore map rather than a
+    JSON string. Its body and article texts are compressed with pack_text;
+    get_unsummarized_content restores them.
+    """
     try:
         _, doc_ref = get_db().collection(PROCESSED_CONTENT).add(
             {
                 "email_message_id": email_message_id,
                 "source": source,
                 "content_type": content_type,
-                "processed_content": processed_content_json,
+                "processed_content": _pack_processed(processed_content),
                 "content_hash": content_hash,
                 "is_summarized": False,
                 "date_processed": firestore.SERVER_TIMESTAMP,
             }
         )
+        _remember_content_hashes([content_hash])
         return doc_ref.id
     except Exception:
         logger.exception(
@@ -216,20 +382,62 @@ def store_processed_content(
         raise
 
 
-def content_hash_exists(content_hash: str) -> bool:
-    """Check whether content with the given hash has already been processed."""
+def _pack_processed(processed_content: dict) -> dict:
+    """Copy *processed_content* with its body and article texts packed."""
+    packed = dict(processed_content)
+    packed["content"] = pack_text(packed.get("content", ""))
+    if "articles" in packed:
+        packed["articles"] = [
+            {**a, "content": pack_text(a.get("content", ""))}
+            for a in packed["articles"]
+        ]
+    return packed
+
+
+def _unpack_processed(processed_content):
+    """Inverse of _pack_processed; legacy JSON strings are returned as-is."""
+    if not isinstance(processed_content, dict):
+        return processed_content
+    processed_content["content"] = unpack_text(processed_content.get("content"))
+    for article in processed_content.get("articles", []):
+        article["content"] = unpack_text(article.get("content"))
+    return processed_content
+
+
+def _remember_content_hashes(content_hashes) -> None:
+    """Mark *content_hashes* as most recently seen, evicting the oldest."""
+    for content_hash in content_hashes:
+        _known_content_hashes[content_hash] = None
+        _known_content_hashes.move_to_end(content_hash)
+    while len(_known_content_hashes) > KNOWN_CONTENT_HASHES_MAX:
+        _known_content_hashes.popitem(last=False)
+
+
+def get_existing_content_hashes(content_hashes: list[bytes]) -> set[bytes]:
+    """Return the subset of *content_hashes* already stored in processed_content.
+
+    Hashes seen earlier in this process are answered from memory; the rest
+    are checked with one ``in`` query per FIRESTORE_IN_QUERY_LIMIT hashes
+    instead of one query per hash.
+    """
+    existing = {h for h in content_hashes if h in _known_content_hashes}
+    unknown = list({h for h in content_hashes if h not in existing})
     try:
-        docs = (
-            get_db()
-            .collection(PROCESSED_CONTENT)
-            .where("content_hash", "==", content_hash)
-            .limit(1)
-            .get()
-        )
-        return len(docs) > 0
+        collection = get_db().collection(PROCESSED_CONTENT)
+        for start in range(0, len(unknown), FIRESTORE_IN_QUERY_LIMIT):
+            chunk = unknown[start:start + FIRESTORE_IN_QUERY_LIMIT]
+            docs = (
+                collection
+                .where("content_hash", "in", chunk)
+                .select(["content_hash"])
+                .get()
+            )
+            for d in docs:
+                existing.add(d.to_dict()["content_hash"])
     except Exception:
-        logger.exception("Error checking content hash: %s", content_hash)
-        return False
+        logger.exception("Error checking content hashes")
+    _remember_content_hashes(existing)
+    return existing
 
 
 def get_unsummarized_content() -> list[dict]:
@@ -242,7 +450,12 @@ def get_unsummarized_content() -> list[dict]:
             .order_by("date_processed")
             .get()
         )
-        return [{"id": d.id, **d.to_dict()} for d in docs]
+        items = []
+        for d in docs:
+            item = {"id": d.id, **d.to_dict()}
+            item["processed_content"] = _unpack_processed(item.get("processed_content"))
+            items.append(item)
+        return items
     except Exception:
         logger.exception("Error fetching unsummarized content")
         return []
@@ -298,10 +511,10 @@ def mark_content_summarized(
     """Batch-update processed-content documents to mark them as summarized."""
     try:
         db = get_db()
-        batch = db.batch()
+        collection = db.collection(PROCESSED_CONTENT)
+        batch = _ChunkedBatch(db)
         for doc_id in content_doc_ids:
-            ref = db.collection(PROCESSED_CONTENT).document(doc_id)
-            batch.update(ref, {
+            batch.update(collection.document(doc_id), {
                 "is_summarized": True,
                 "summary_doc_id": summary_doc_id,
                 "date_summarized": firestore.SERVER_TIMESTAMP,
@@ -346,30 +559,28 @@ def get_recent_summaries(days: int = 5) -> list[dict]:
 # Summarized Content History
 # ---------------------------------------------------------------------------
 
-def store_summarized_content_history(
-    content_hash: str,
-    content_title: str,
-    content_fingerprint: str,
-    summary_doc_id: str,
-) -> None:
-    """Record that a piece of content was included in a summary.
+def store_summarized_content_history(entries: list[dict]) -> None:
+    """Batch-record that pieces of content were included in a summary.
 
-    Uses content_hash as the document ID for fast dedup lookups.
+    Each entry dict carries ``content_hash``, ``content_title``,
+    ``content_fingerprint`` and ``summary_doc_id``. content_hash is used as
+    the document ID for fast dedup lookups.
     """
     try:
-        get_db().collection(SUMMARIZED_CONTENT_HISTORY).document(content_hash).set(
-            {
-                "content_hash": content_hash,
-                "content_title": content_title,
-                "content_fingerprint": content_fingerprint,
-                "summary_doc_id": summary_doc_id,
+        db = get_db()
+        collection = db.collection(SUMMARIZED_CONTENT_HISTORY)
+        batch = _ChunkedBatch(db)
+        for entry in entries:
+            batch.set(collection.document(entry["content_hash"]), {
+                "content_hash": entry["content_hash"],
+                "content_title": entry["content_title"],
+                "content_fingerprint": entry["content_fingerprint"],
+                "summary_doc_id": entry["summary_doc_id"],
                 "date_summarized": firestore.SERVER_TIMESTAMP,
-            }
-        )
+            })
+        batch.commit()
     except Exception:
-        logger.exception(
-            "Error storing summarized content history: %s", content_hash
-        )
+        logger.exception("Error storing summarized content history")
         raise
 
 
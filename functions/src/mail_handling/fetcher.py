@@ -6,41 +6,106 @@ as dicts — the caller (Cloud Function) handles Firestore storage and
 duplicate checking.
 """
 
+import functools
 import imaplib
 import logging
+import random
+import re
 import socket
 import time
-import base64
 import email as email_lib
 from datetime import datetime, timedelta, timezone
 from email.header import decode_header
 
+from charset_normalizer import from_bytes
+
 logger = logging.getLogger(__name__)
 
 MAX_CONNECT_RETRIES = 5
 INITIAL_RETRY_DELAY_SECONDS = 5
 CONNECTION_TIMEOUT_SECONDS = 30
-CONNECTION_CHECK_INTERVAL = 10
-
-
-def _extract_rfc822_bytes(msg_data):
-    """Pull the RFC822 body bytes from an imaplib FETCH response.
-
-    Normal response: ``[(b'N (RFC822 {size}', b'<body>'), b')']`` — a tuple of
-    (envelope, body) first. Edge cases (message deleted between SEARCH and
-    FETCH, Gmail flag-only responses, certain large/malformed messages)
-    return ``[b'N (UID … RFC822 …)']`` — a bare bytes element with no body.
-    Indexing ``[0][1]`` into the bytes form yields an int, which then
-    explodes inside ``email.message_from_bytes``.
+# Messages per FETCH command. One command per chunk instead of per message
+# saves a round trip each; the cap bounds how many full newsletters sit in
+# memory at once.
+FETCH_BATCH_SIZE = 20
+
+# Messages per header-only FETCH. Only the Message-ID line comes back, so
+# these can be much larger than body chunks.
+HEADER_FETCH_BATCH_SIZE = 500
+
+
+def _extract_fetch_bodies(msg_data):
+    """Map message sequence number to body bytes from an imaplib FETCH response.
+
+    Normal response: ``[(b'N (RFC822 {size}', b'<body>'), b')', ...]`` — one
+    (envelope, body) tuple per message, followed by a closing paren. Edge
+    cases (message deleted between SEARCH and FETCH, Gmail flag-only
+    responses, certain large/malformed messages) yield a bare bytes element
+    such as ``b'N (UID … RFC822 …)'`` with no body; those messages are
+    simply absent from the result. Indexing ``[0][1]`` into the bytes form
+    yields an int, which then explodes inside ``email.message_from_bytes``.
     """
+    bodies = {}
     for entry in msg_data or ():
         if (
             isinstance(entry, tuple)
             and len(entry) >= 2
+            and isinstance(entry[0], (bytes, bytearray))
             and isinstance(entry[1], (bytes, bytearray))
         ):
-            return bytes(entry[1])
-    return None
+            seq = entry[0].split(None, 1)[0] if entry[0].strip() else b''
+            bodies[bytes(seq)] = bytes(entry[1])
+    return bodies
+
+
+_HTML_DOC_RE = re.compile(r'<html[^>]*>.*?</html>', re.DOTALL | re.IGNORECASE)
+
+# MIME body types kept from a message, mapped to their key in the content dict.
+_BODY_CONTENT_TYPES = {'text/plain': 'text', 'text/html': 'html'}
+
+
+def _decode_payload(payload, charset):
+    """Decode a MIME body using its declared charset, detecting only as a last resort.
+
+    Most parts are UTF-8 or declare their charset correctly; charset
+    detection runs once, and only when that decode fails.
+    """
+    try:
+        return payload.decode(charset or 'utf-8')
+    except (UnicodeDecodeError, LookupError):
+        pass
+
+    best = from_bytes(payload).best()
+    if best is not None:
+        return str(best)
+    return payload.decode('utf-8', errors='replace')
+
+
+def _decode_header_value(header):
+    """Decode an RFC-2047 encoded header (str or Header) into a plain string."""
+    try:
+        decoded_parts = decode_header(header)
+        parts = []
+        for part, encoding in decoded_parts:
+            if isinstance(part, bytes):
+                try:
+                    parts.append(
+                        part.decode(encoding) if encoding
+                        else part.decode('utf-8', errors='ignore')
+                    )
+                except (UnicodeDecodeError, LookupError):
+                    parts.append(part.decode('utf-8', errors='ignore'))
+            else:
+                parts.append(part)
+        return ' '.join(parts)
+    except Exception:
+        logger.error("Error decoding header", exc_info=True)
+        return header
+
+
+# Newsletters repeat a handful of senders (and each subject is decoded
+# twice per message), so encoded headers are memoized.
+_decode_header_cached = functools.lru_cache(maxsize=4096)(_decode_header_value)
 
 
 class EmailFetcher:
@@ -62,7 +127,7 @@ class EmailFetcher:
         self._mail = None
 
     def connect(self):
-        """Connect to the IMAP server with retry + exponential backoff."""
+        """Connect to the IMAP server with retry + jittered exponential backoff."""
         retry_delay = INITIAL_RETRY_DELAY_SECONDS
 
         if self._mail:
@@ -85,23 +150,18 @@ class EmailFetcher:
                 logger.info("Successfully connected to %s", self.server)
                 return self._mail
 
-            except (socket.gaierror, socket.timeout, OSError) as exc:
-                logger.error("Network error connecting to server: %s", exc)
-                if attempt < MAX_CONNECT_RETRIES - 1:
-                    logger.info("Retrying in %.1f seconds…", retry_delay)
-                    time.sleep(retry_delay)
-                    retry_delay *= 1.5
-                else:
-                    raise
-
             except Exception as exc:
-                logger.error("Failed to connect to email server: %s", exc)
-                if attempt < MAX_CONNECT_RETRIES - 1:
-                    logger.info("Retrying in %.1f seconds…", retry_delay)
-                    time.sleep(retry_delay)
-                    retry_delay *= 1.5
+                if isinstance(exc, (socket.gaierror, socket.timeout, OSError)):
+                    logger.error("Network error connecting to server: %s", exc)
                 else:
+                    logger.error("Failed to connect to email server: %s", exc)
+                if attempt == MAX_CONNECT_RETRIES - 1:
                     raise
+                # Jitter keeps overlapping invocations from retrying in lockstep.
+                delay = retry_delay * random.uniform(0.5, 1.5)
+                logger.info("Retrying in %.1f seconds…", delay)
+                time.sleep(delay)
+                retry_delay *= 1.5
 
     def check_connection(self, mail=None):
         """Verify IMAP connection is alive; reconnect if dead."""
@@ -124,15 +184,21 @@ class EmailFetcher:
         self._mail = None
         return self.connect()
 
-    def fetch_new_emails(self):
+    def fetch_new_emails(self, seen_message_ids=None):
         """Fetch UNSEEN + recent emails from all configured folders.
 
+        Args:
+            seen_message_ids: Optional set of Message-IDs already processed;
+                matching messages are skipped before parsing. Messages
+                returned by this call are added to it.
+
         Returns a list of dicts, each with: message_id, subject, sender,
         date, content (text), html, raw_content. The caller is responsible
-        for checking Firestore for duplicates.
+        for checking Firestore for duplicates outside *seen_message_ids*.
         """
         mail = self.connect()
         all_emails = []
+        seen = seen_message_ids if seen_message_ids is not None else set()
 
         try:
             since_date = (
@@ -165,44 +231,51 @@ class EmailFetcher:
                     len(all_ids), folder,
                 )
 
-                for e_id in all_ids:
-                    try:
-                        if (
-                            len(all_emails) > 0
-                            and len(all_emails) % CONNECTION_CHECK_INTERVAL == 0
-                        ):
-                            mail = self.check_connection(mail)
-
-                        status, msg_data = mail.fetch(e_id, '(RFC822)')
-                        if status != 'OK':
-                            logger.warning("Failed to fetch email %s: %s", e_id, msg_data)
-                            continue
-
-                        raw_bytes = _extract_rfc822_bytes(msg_data)
-                        if raw_bytes is None:
-                            logger.warning(
-                                "Unexpected IMAP response shape for email %s: %r — skipping",
-                                e_id, msg_data,
-                            )
-                            continue
-
-                        msg = email_lib.message_from_bytes(raw_bytes)
-                        subject = self._decode_header(msg.get('Subject', 'No Subject'))
-                        sender = self._decode_header(msg.get('From', 'Unknown'))
-                        logger.info("Processing email: %s from %s", subject, sender)
+                # Download full bodies only for messages not seen before.
+                message_ids = self._fetch_message_ids(mail, all_ids)
+                all_ids = [
+                    e_id for e_id in all_ids
+                    if not message_ids.get(e_id) or message_ids[e_id] not in seen
+                ]
+                if not all_ids:
+                    logger.info("All emails in folder %s already processed", folder)
+                    continue
 
-                        parsed = self._parse_email(msg)
-                        if parsed:
-                            all_emails.append(parsed)
-                        else:
-                            logger.warning("Failed to parse email %s — skipping", subject)
+                for start in range(0, len(all_ids), FETCH_BATCH_SIZE):
+                    chunk = all_ids[start:start + FETCH_BATCH_SIZE]
+                    if start:
+                        mail = self.check_connection(mail)
 
+                    try:
+                        status, msg_data = mail.fetch(b','.join(chunk), '(RFC822)')
                     except Exception:
                         logger.exception(
-                            "Error processing email id %s — skipping to preserve batch",
-                            e_id,
+                            "Error fetching emails %s — skipping to preserve batch",
+                            chunk,
                         )
                         continue
+                    if status != 'OK':
+                        logger.warning("Failed to fetch emails %s: %s", chunk, msg_data)
+                        continue
+
+                    bodies = _extract_fetch_bodies(msg_data)
+                    for e_id in chunk:
+                        raw_bytes = bodies.get(e_id)
+                        if raw_bytes is None:
+                            logger.warning(
+                                "No message body in IMAP response for email %s — skipping",
+                                e_id,
+                            )
+                            continue
+                        try:
+                            parsed = self._parse_raw_email(raw_bytes, seen)
+                            if parsed:
+                                all_emails.append(parsed)
+                        except Exception:
+                            logger.exception(
+                                "Error processing email id %s — skipping to preserve batch",
+                                e_id,
+                            )
 
             self._close_connection(mail)
             logger.info(
@@ -229,6 +302,56 @@ class EmailFetcher:
             pass
         self._mail = None
 
+    def _fetch_message_ids(self, mail, email_ids):
+        """Return ``{sequence number: Message-ID}`` using header-only fetches.
+
+        BODY.PEEK leaves the \\Seen flag alone, so messages filtered out here
+        are not marked read. Messages the server returns no header for, or
+        whose header fetch fails, are absent from the result and get a full
+        fetch.
+        """
+        message_ids = {}
+        for start in range(0, len(email_ids), HEADER_FETCH_BATCH_SIZE):
+            chunk = email_ids[start:start + HEADER_FETCH_BATCH_SIZE]
+            try:
+                status, msg_data = mail.fetch(
+                    b','.join(chunk), '(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])'
+                )
+            except Exception:
+                logger.exception("Error fetching Message-ID headers — fetching in full")
+                continue
+            if status != 'OK':
+                logger.warning("Failed to fetch Message-ID headers: %s", msg_data)
+                continue
+            for e_id, header in _extract_fetch_bodies(msg_data).items():
+                message_id = email_lib.message_from_bytes(header).get('Message-ID', '')
+                if message_id:
+                    message_ids[e_id] = message_id
+        return message_ids
+
+    def _parse_raw_email(self, raw_bytes, seen):
+        """Parse one fetched message unless its Message-ID is in *seen*.
+
+        Returns the parsed dict (adding its Message-ID to *seen*) or None.
+        """
+        msg = email_lib.message_from_bytes(raw_bytes)
+        message_id = msg.get('Message-ID', '')
+        if message_id and message_id in seen:
+            logger.debug("Already processed, skipping: %s", message_id)
+            return None
+
+        subject = self._decode_header(msg.get('Subject', 'No Subject'))
+        sender = self._decode_header(msg.get('From', 'Unknown'))
+        logger.info("Processing email: %s from %s", subject, sender)
+
+        parsed = self._parse_email(msg)
+        if not parsed:
+            logger.warning("Failed to parse email %s — skipping", subject)
+            return None
+        if message_id:
+            seen.add(message_id)
+        return parsed
+
     def _parse_email(self, msg):
         """Parse an email.message.Message into a flat dict."""
         try:
@@ -277,24 +400,11 @@ class EmailFetcher:
 
     def _decode_header(self, header):
         """Decode an RFC-2047 encoded email header into a plain string."""
-        try:
-            decoded_parts = decode_header(header)
-            parts = []
-            for part, encoding in decoded_parts:
-                if isinstance(part, bytes):
-                    try:
-                        parts.append(
-                            part.decode(encoding) if encoding
-                            else part.decode('utf-8', errors='ignore')
-                        )
-                    except (UnicodeDecodeError, LookupError):
-                        parts.append(part.decode('utf-8', errors='ignore'))
-                else:
-                    parts.append(part)
-            return ' '.join(parts)
-        except Exception:
-            logger.error("Error decoding header", exc_info=True)
-            return header
+        if isinstance(header, str):
+            if header.isascii() and '=?' not in header:
+                return header
+            return _decode_header_cached(header)
+        return _decode_header_value(header)
 
     def _get_email_content(self, msg):
         """Extract text, html, and raw content from an email message.
@@ -307,56 +417,11 @@ class EmailFetcher:
             'text': '',
             'html': '',
             'attachments': [],
-            'raw_message': str(msg),
         }
 
-        best_html_part = ""
-        best_text_part = ""
-
-        def inspect_part(part):
-            nonlocal best_html_part, best_text_part
-
-            content_type = part.get_content_type()
-            disposition = str(part.get("Content-Disposition", ""))
-
-            if "attachment" in disposition:
-                try:
-                    filename = part.get_filename()
-                    if filename:
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            content['attachments'].append({
-                                'filename': filename,
-                                'content_type': content_type,
-                                'data': base64.b64encode(payload).decode('utf-8'),
-                            })
-                except Exception as exc:
-                    logger.error("Error processing attachment: %s", exc)
-                return
-
-            try:
-                if part.is_multipart():
-                    for subpart in part.get_payload():
-                        inspect_part(subpart)
-                else:
-                    payload = part.get_payload(decode=True)
-                    if not payload:
-                        return
-
-                    if content_type == "text/plain":
-                        decoded = payload.decode("utf-8", errors="replace")
-                        if len(decoded) > len(best_text_part):
-                            best_text_part = decoded
-
-                    elif content_type == "text/html":
-                        decoded = payload.decode("utf-8", errors="replace")
-                        if len(decoded) > len(best_html_part):
-                            best_html_part = decoded
-                    else:
-                        logger.debug("Found other content type: %s", content_type)
-
-            except Exception as exc:
-                logger.error("Error processing part: %s", exc)
+        # Largest body seen per content type, as (payload, declared charset).
+        # Candidates stay as raw bytes; only the winners are decoded.
+        best_parts = dict.fromkeys(_BODY_CONTENT_TYPES, (b"", None))
 
         try:
             subject = msg.get('Subject', '')
@@ -365,14 +430,6 @@ class EmailFetcher:
                 logger.debug("Processing forwarded message: %s", subject)
 
             if is_forwarded:
-                from email import policy  # noqa: F401
-                raw_email_string = msg.as_string()
-                content['raw_email'] = raw_email_string
-                logger.info(
-                    "Stored raw email for forwarded message, length: %d",
-                    len(raw_email_string),
-                )
-
                 if msg.is_multipart():
                     parts = msg.get_payload()
                     if len(parts) > 1:
@@ -382,8 +439,8 @@ class EmailFetcher:
                                 if subpart.get_content_type() == 'text/html':
                                     orig_html = subpart.get_payload(decode=True)
                                     if orig_html:
-                                        html_str = orig_html.decode(
-                                            'utf-8', errors='replace'
+                                        html_str = _decode_payload(
+                                            orig_html, subpart.get_content_charset()
                                         )
                                         content['forwarded_html'] = html_str
                                         logger.info(
@@ -391,12 +448,47 @@ class EmailFetcher:
                                             len(html_str),
                                         )
 
-            inspect_part(msg)
+            # Depth-first over the MIME tree with an explicit stack, so an
+            # attachment (including a message/rfc822 one) prunes its subtree.
+            stack = [msg]
+            while stack:
+                part = stack.pop()
+                try:
+                    content_type = part.get_content_type()
+                    disposition = str(part.get("Content-Disposition", ""))
+
+                    if "attachment" in disposition:
+                        # Nothing downstream reads attachment bodies; record
+                        # what was attached without decoding the payload.
+                        filename = part.get_filename()
+                        if filename:
+                            content['attachments'].append({
+                                'filename': filename,
+                                'content_type': content_type,
+                            })
+                        continue
+
+                    if part.is_multipart():
+                        stack.extend(reversed(part.get_payload()))
+                        continue
 
-            if best_html_part:
-                content['html'] = best_html_part
-            if best_text_part:
-                content['text'] = best_text_part
+                    payload = part.get_payload(decode=True)
+                    if not payload:
+                        continue
+
+                    best = best_parts.get(content_type)
+                    if best is None:
+                        logger.debug("Found other content type: %s", content_type)
+                    elif len(payload) > len(best[0]):
+                        best_parts[content_type] = (payload, part.get_content_charset())
+
+                except Exception as exc:
+                    logger.error("Error processing part: %s", exc)
+
+            for content_type, key in _BODY_CONTENT_TYPES.items():
+                payload, charset = best_parts[content_type]
+                if payload:
+                    content[key] = _decode_payload(payload, charset)
 
             html_len = len(content['html'])
             text_len = len(content['text'])
@@ -407,14 +499,12 @@ class EmailFetcher:
             if is_forwarded and html_len > 0:
                 self._extract_forwarded_from_html(content)
 
+            # The only place the whole message is re-serialized, and only
+            # when no usable body part was found.
             if (html_len < 100 and text_len < 100) and msg.is_multipart():
-                import re
                 raw = str(msg)
                 content['raw_content'] = raw
-                html_match = re.search(
-                    r'<html[^>]*>.*?</html>', raw,
-                    re.DOTALL | re.IGNORECASE,
-                )
+                html_match = _HTML_DOC_RE.search(raw)
                 if html_match and len(html_match.group(0)) > html_len:
                     content['html'] = html_match.group(0)
 
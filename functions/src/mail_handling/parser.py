@@ -8,11 +8,15 @@ produced by the fetcher. No database calls.
 import re
 import json
 import logging
-from bs4 import BeautifulSoup
+import lxml.html
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# Email bodies arrive as str; hand libxml2 UTF-8 bytes instead, which also
+# sidesteps lxml's refusal to parse str input with an encoding declaration.
+_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
 FORWARDED_MARKERS = ['Fwd:', 'FW:', 'Forwarded:']
 
 TRACKING_DOMAINS = [
@@ -51,6 +55,15 @@ REDIRECT_PATTERNS = [
 MIN_SUBSTANTIAL_LENGTH = 200
 MIN_CONTENT_LENGTH = 50
 
+# http(s) with a non-empty host, or a bare www. Brackets and control
+# characters change how urlparse reads the URL (or make it raise), so URLs
+# containing them are checked with urlparse itself instead.
+_VALID_URL_RE = re.compile(r'[\x00-\x20]*(?i:https?)://[^/?#]|www\.')
+_URL_NEEDS_PARSE_RE = re.compile(r'[\[\]\x00-\x1f]')
+_URL_RE = re.compile(r'https?://[^\s<>"\']+|www\.[^\s<>"\']+')
+_TAG_RE = re.compile(r'<[^>]*>')
+_FORWARDED_HEADERS_RE = re.compile(r"From:.*?\nDate:.*?\nSubject:.*?\nTo:", re.DOTALL)
+
 
 class EmailParser:
     """Parses email content and extracts links — no database interaction."""
@@ -132,38 +145,41 @@ class EmailParser:
 
         try:
             if content_type.lower() == 'html':
-                soup = BeautifulSoup(content, 'html.parser')
-                for a_tag in soup.find_all('a'):
+                seen = set()
+                is_valid_url = self._is_valid_url
+                is_tracking_url = self._is_tracking_url
+                root = lxml.html.document_fromstring(
+                    content.encode('utf-8'), parser=_HTML_PARSER
+                )
+                for a_tag in root.iter('a'):
                     url = a_tag.get('href', '')
-                    if not url or not self._is_valid_url(url):
+                    if not url:
                         continue
+                    key = url.strip()
+                    if key in seen or not is_valid_url(url):
+                        continue
+                    seen.add(key)
 
-                    title = a_tag.get_text(strip=True) or a_tag.get('title', '') or "Link"
-                    is_tracking = self._is_tracking_url(url)
+                    # Same as BeautifulSoup's get_text(strip=True).
+                    text = ''.join(s.strip() for s in a_tag.itertext())
+                    title = text or a_tag.get('title', '') or "Link"
 
                     links.append({
                         'url': url,
                         'title': title,
                         'source': 'html',
-                        'is_tracking': is_tracking,
+                        'is_tracking': is_tracking_url(url),
                         'original_url': url,
                     })
             else:
+                # _extract_links_with_regex already returns unique URLs.
                 links = self._extract_links_with_regex(content)
                 for link in links:
                     link['is_tracking'] = self._is_tracking_url(link.get('url', ''))
                     link['original_url'] = link.get('url', '')
 
-            seen = set()
-            unique = []
-            for link in links:
-                url = link.get('url', '').strip()
-                if url not in seen:
-                    seen.add(url)
-                    unique.append(link)
-
-            logger.info("Extracted %d unique links from content", len(unique))
-            return unique
+            logger.info("Extracted %d unique links from content", len(links))
+            return links
 
         except Exception:
             logger.error("Error extracting links", exc_info=True)
@@ -179,7 +195,8 @@ class EmailParser:
             return ""
 
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(html_content, 'lxml')
 
             for tag in soup(['script', 'style', 'header']):
                 tag.decompose()
@@ -233,6 +250,7 @@ class EmailParser:
         if not html_content:
             return ""
         try:
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(html_content, 'html.parser')
             text = ""
             for el in soup.find_all(['p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']):
@@ -244,7 +262,7 @@ class EmailParser:
             return text.strip()
         except Exception:
             logger.exception("Error extracting text from HTML")
-            return re.sub(r'<[^>]*>', ' ', html_content)
+            return _TAG_RE.sub(' ', html_content)
 
     # ------------------------------------------------------------------
     # URL helpers
@@ -253,13 +271,15 @@ class EmailParser:
     def _is_valid_url(self, url):
         if not url:
             return False
+        if _URL_NEEDS_PARSE_RE.search(url) is None:
+            return _VALID_URL_RE.match(url) is not None
         if url.startswith('www.'):
             url = 'http://' + url
         try:
             result = urlparse(url)
-            return result.scheme in ('http', 'https') and bool(result.netloc)
-        except Exception:
+        except ValueError:
             return False
+        return result.scheme in ('http', 'https') and bool(result.netloc)
 
     def _is_tracking_url(self, url):
         if not url or not isinstance(url, str):
@@ -276,13 +296,16 @@ class EmailParser:
         """Regex-based link extraction for plain-text content."""
         links = []
         seen = set()
-        url_pattern = r'https?://[^\s<>"\']+|www\.[^\s<>"\']+'
 
         try:
             if not isinstance(content, str):
                 content = str(content) if content is not None else ""
 
-            for url in re.findall(url_pattern, content):
+            # Substring checks reject URL-free bodies without starting the regex.
+            if 'http' not in content and 'www.' not in content:
+                return links
+
+            for url in _URL_RE.findall(content):
                 url = url.rstrip(',.;:\'\"!?)')
                 if url.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.svg')):
                     continue
@@ -311,6 +334,7 @@ class EmailParser:
             is_html = '<html' in raw_str.lower() or '<!doctype html' in raw_str.lower()
 
             if is_html:
+                from bs4 import BeautifulSoup
                 soup = BeautifulSoup(raw_str, 'html.parser')
                 body = soup.find('body')
                 if body:
@@ -370,6 +394,7 @@ class EmailParser:
             is_html = '<html' in full_message.lower() or '<div' in full_message.lower()
 
             if is_html:
+                from bs4 import BeautifulSoup
                 soup = BeautifulSoup(full_message, 'html.parser')
 
                 if is_forwarded:
@@ -422,8 +447,7 @@ class EmailParser:
                         if len(parts) > 1:
                             return parts[1]
 
-                header_pattern = r"From:.*?\nDate:.*?\nSubject:.*?\nTo:"
-                match = re.search(header_pattern, full_message, re.DOTALL)
+                match = _FORWARDED_HEADERS_RE.search(full_message)
                 if match and match.end() < len(full_message):
                     return full_message[match.end():]
 
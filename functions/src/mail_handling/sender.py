@@ -13,7 +13,6 @@ from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
@@ -168,6 +167,7 @@ class EmailSender:
         html_content = '\n'.join(processed)
 
         try:
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(html_content, 'html.parser')
 
             for tag in soup.find_all(string=re.compile(r'^#+\s+')):
@@ -261,6 +261,7 @@ class EmailSender:
         md = '\n'.join(result)
 
         try:
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(md, 'html.parser')
 
             standalone = soup.find_all('li', recursive=False)
@@ -378,6 +379,7 @@ def _wrap_in_template(body_html, current_date):
 def _sanitize_links(html):
     """Remove links to tracker/problematic domain roots."""
     try:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, 'html.parser')
 
         for link in soup.find_all('a'):
@@ -411,6 +413,7 @@ def _html_to_plain(html, current_date):
     """Generate a plain-text fallback from the HTML body."""
     text = f"LetterMonstr Newsletter Summary\n{'=' * 31}\n\n"
     try:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, 'html.parser')
         text += soup.get_text(separator='\n\n')
     except Exception:
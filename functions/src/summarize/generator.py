@@ -5,6 +5,7 @@ Uses the Anthropic Claude API to generate newsletter summaries.
 No direct database access — the caller handles persistence via Firestore.
 """
 
+import functools
 import logging
 import re
 from datetime import datetime
@@ -105,6 +106,16 @@ Focus on key findings and essential information - users can click links to explo
 }
 
 
+@functools.lru_cache(maxsize=1)
+def _get_client(api_key):
+    """Return an Anthropic client shared across invocations on this instance.
+
+    The client owns an HTTP connection pool; reusing it keeps TLS connections
+    to the API warm between summary runs. A rotated key evicts the old client.
+    """
+    return Anthropic(api_key=api_key)
+
+
 class SummaryGenerator:
     """Generates summaries using the Claude API."""
 
@@ -119,7 +130,7 @@ class SummaryGenerator:
         self.temperature = config['temperature']
         self.client = None
         if self.api_key:
-            self.client = Anthropic(api_key=self.api_key)
+            self.client = _get_client(self.api_key)
 
     # ------------------------------------------------------------------
     # Public API
@@ -144,6 +144,12 @@ class ContentProcessor:
                 h['content_fingerprint'] for h in historical_content
                 if h.get('content_fingerprint')
             ]
+            # Analyse each historical fingerprint once up front;
+            # SequenceMatcher caches its view of the second sequence, so
+            # only the item side is re-read per comparison.
+            historical_matchers = [
+                difflib.SequenceMatcher(None, b=fp) for fp in historical_fingerprints
+            ]
             historical_titles = [
                 h['content_title'] for h in historical_content
                 if h.get('content_title')
@@ -174,11 +180,10 @@ class ContentProcessor:
                     skipped_items += 1
                     continue
 
-                content_match = False
-                for hist_fingerprint in historical_fingerprints:
-                    if self._is_similar(fingerprint, hist_fingerprint):
-                        content_match = True
-                        break
+                content_match = any(
+                    self._is_similar(matcher, fingerprint)
+                    for matcher in historical_matchers
+                )
 
                 if content_match:
                     logger.info(f"Skipping previously summarized content (content match): {title[:80]} [{source}]")
@@ -376,10 +381,20 @@ class ContentProcessor:
     # Similarity helpers
     # ------------------------------------------------------------------
 
-    def _is_similar(self, text1, text2):
-        """Return True when two text bodies exceed the similarity threshold."""
-        similarity = difflib.SequenceMatcher(None, text1, text2).ratio()
-        return similarity >= self.similarity_threshold
+    def _is_similar(self, matcher, text):
+        """Return True when *text* and the matcher's cached body exceed the threshold.
+
+        real_quick_ratio() and quick_ratio() are cheap upper bounds on
+        ratio(), so most non-matches are rejected without the full
+        matching-blocks pass.
+        """
+        matcher.set_seq1(text)
+        threshold = self.similarity_threshold
+        return (
+            matcher.real_quick_ratio() >= threshold
+            and matcher.quick_ratio() >= threshold
+            and matcher.ratio() >= threshold
+        )
 
     def _is_similar_title(self, title1, title2):
         """Return True when two titles are similar enough to be the same article."""
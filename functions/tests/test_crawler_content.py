@@ -0,0 +1,317 @@
+"""Smoke tests: verify WebCrawler page decoding and content extraction."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture()
+def crawler(mock_content_config):
+    from src.crawl.crawler import WebCrawler
+    return WebCrawler(mock_content_config)
+
+
+def _response(body, content_type="text/html"):
+    response = MagicMock()
+    response.status_code = 200
+    response.__enter__.return_value = response
+    response.iter_content.side_effect = lambda size: iter([body])
+    response.headers = {"Content-Type": content_type}
+    response.encoding = None
+    if "charset=" in content_type:
+        response.encoding = content_type.split("charset=")[1]
+    return response
+
+
+class TestDecodeBody:
+    def test_undeclared_utf8(self, crawler):
+        body = "<p>café</p>".encode("utf-8")
+        assert crawler._decode_body(_response(body), body) == "<p>café</p>"
+
+    def test_declared_charset_is_used(self, crawler):
+        body = "<p>café</p>".encode("latin-1")
+        response = _response(body, "text/html; charset=ISO-8859-1")
+        assert crawler._decode_body(response, body) == "<p>café</p>"
+
+    def test_undeclared_non_utf8_falls_back_to_detection(self, crawler):
+        body = ("<p>" + "déjà vu, naïve café " * 20 + "</p>").encode("cp1252")
+        result = crawler._decode_body(_response(body), body)
+        assert "�" not in result
+        assert result.startswith("<p>")
+
+
+class TestExtractContent:
+    PAGE = (
+        "<html><head><title>Page Title</title>"
+        '<meta name="description" content="A description"></head>'
+        "<body><nav>Menu</nav><script>var x = 1;</script>"
+        "<article><h1>Headline</h1><p>Body   text here.</p></article>"
+        "<footer>Footer</footer></body></html>"
+    )
+
+    def test_extracts_title_description_and_article_text(self, crawler):
+        result = crawler._extract_content("https://example.com/a", self.PAGE)
+        assert result["title"] == "Page Title"
+        assert result["description"] == "A description"
+        assert result["clean_text"] == "Headline Body text here."
+
+    def test_falls_back_to_body(self, crawler):
+        html = "<html><body><nav>Menu</nav><div>Just a div</div></body></html>"
+        result = crawler._extract_content("https://example.com/b", html)
+        assert result["clean_text"] == "Just a div"
+
+    def test_falls_back_to_content_id(self, crawler):
+        html = (
+            "<html><body><div id='sidebar'>Side</div>"
+            "<div id='content'>Main <b>story</b></div></body></html>"
+        )
+        result = crawler._extract_content("https://example.com/c", html)
+        assert result["clean_text"] == "Main story"
+
+    def test_article_wins_over_earlier_main_and_content_id(self, crawler):
+        html = (
+            "<html><body><div id='content'>Wrapper</div><main>Main</main>"
+            "<article>Story</article></body></html>"
+        )
+        result = crawler._extract_content("https://example.com/e", html)
+        assert result["clean_text"] == "Story"
+
+    def test_ignores_candidates_inside_page_chrome(self, crawler):
+        html = (
+            "<html><body><aside><article>Related</article></aside>"
+            "<article>Story<nav>Next</nav></article></body></html>"
+        )
+        result = crawler._extract_content("https://example.com/f", html)
+        assert result["clean_text"] == "Story"
+
+    def test_xml_declaration_is_tolerated(self, crawler):
+        html = (
+            '<?xml version="1.0" encoding="iso-8859-1"?>'
+            "<html><head><title>Café</title></head><body><p>x</p></body></html>"
+        )
+        result = crawler._extract_content("https://example.com/d", html)
+        assert result["title"] == "Café"
+        assert result["clean_text"] == "x"
+
+
+class TestCrawl:
+    def test_preserves_link_order_and_drops_failures(self, crawler, monkeypatch):
+        pages = {
+            "https://a.example.com/one": "<html><body><p>First</p></body></html>",
+            "https://b.example.com/two": None,
+            "https://c.example.com/three": "<html><body><p>Third</p></body></html>",
+        }
+        links = [{"url": url, "title": ""} for url in pages]
+        monkeypatch.setattr(crawler, "get_content_urls", lambda l: l)
+        monkeypatch.setattr(crawler, "_is_safe_url", lambda url: True)
+        monkeypatch.setattr(crawler, "_fetch_page", pages.get)
+
+        result = crawler.crawl(links)
+
+        assert [item["content"] for item in result] == ["First", "Third"]
+
+    def test_same_host_requests_are_spaced(self, crawler, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr("src.crawl.crawler.time.sleep", sleeps.append)
+        crawler._wait_for_host("https://example.com/a")
+        crawler._wait_for_host("https://example.com/b")
+        crawler._wait_for_host("https://other.example.org/c")
+        assert len(sleeps) == 1
+        assert sleeps[0] > 0.9
+
+
+class TestGetContentUrls:
+    def test_resolves_in_order_and_drops_unresolvable(self, crawler, monkeypatch):
+        redirects = {
+            "https://t.example.com/1": "https://news.example.com/story-1",
+            "https://t.example.com/2": None,
+            "https://news.example.com/story-3": "https://news.example.com/story-3",
+        }
+        monkeypatch.setattr(crawler, "resolve_redirect", redirects.get)
+        links = [{"url": url, "title": f"t{i}"} for i, url in enumerate(redirects)]
+        links.append({"url": "mailto:someone@example.com"})
+
+        result = crawler.get_content_urls(links)
+
+        assert result == [
+            {"url": "https://news.example.com/story-1", "title": "t0",
+             "original_url": "https://t.example.com/1"},
+            {"url": "https://news.example.com/story-3", "title": "t2",
+             "original_url": None},
+        ]
+
+
+class TestNormalizeUrl:
+    def test_strips_tracking_params_www_fragment_and_slash(self):
+        from src.crawl.crawler import normalize_url
+        url = "HTTPS://www.Example.com/story/?utm_source=news&id=7&fbclid=x#top"
+        assert normalize_url(url) == "https://example.com/story?id=7"
+
+    def test_keeps_www_inside_host(self):
+        from src.crawl.crawler import normalize_url
+        assert normalize_url("https://awww.example.com/a") == "https://awww.example.com/a"
+
+    def test_malformed_host_returns_none(self):
+        from src.crawl.crawler import normalize_url
+        assert normalize_url("http://[broken/x") is None
+
+
+class TestIsAdvertisement:
+    def test_matches_keyword_case_insensitively(self, crawler):
+        content = {"title": "Great read", "description": "", "clean_text": "A SPONSORED post"}
+        assert crawler._is_advertisement(content) is True
+
+    def test_no_keyword_match(self, crawler):
+        content = {"title": "Great read", "description": "News", "clean_text": "Plain article"}
+        assert crawler._is_advertisement(content) is False
+
+    def test_empty_keyword_list(self, mock_content_config):
+        from src.crawl.crawler import WebCrawler
+        crawler = WebCrawler({**mock_content_config, "ad_keywords": []})
+        assert crawler._is_advertisement({"clean_text": "sponsored"}) is False
+
+    def test_matches_in_description_only(self, crawler):
+        content = {"title": "Read", "description": "Advertisement", "clean_text": "body"}
+        assert crawler._is_advertisement(content) is True
+
+
+class TestIsDuplicatePage:
+    def test_same_text_with_different_spacing_and_numbers(self, crawler):
+        assert crawler._is_duplicate_page("Big story Views: 10") is False
+        assert crawler._is_duplicate_page("Big   story\nViews: 11") is True
+
+    def test_different_text(self, crawler):
+        assert crawler._is_duplicate_page("One story") is False
+        assert crawler._is_duplicate_page("Another story") is False
+
+    def test_pages_sharing_a_script_shell_are_not_duplicates(self, crawler, monkeypatch):
+        shell = "<script>" + "window.app = {};" * 200 + "</script>"
+        pages = {
+            f"https://example.com/{slug}":
+                f"<html><head>{shell}</head><body><article><p>{text}</p></article></body></html>"
+            for slug, text in (("a", "First article text"), ("b", "Second article text"))
+        }
+        monkeypatch.setattr(crawler, "_fetch_page", pages.get)
+        monkeypatch.setattr(crawler, "_is_safe_url", lambda url: True)
+        monkeypatch.setattr(crawler, "_wait_for_host", lambda url: None)
+
+        crawled = [crawler._crawl_one({"url": url}) for url in pages]
+
+        assert [c["content"] for c in crawled] == ["First article text", "Second article text"]
+
+    def test_same_article_with_different_scripts_is_duplicate(self, crawler, monkeypatch):
+        pages = {
+            f"https://example.com/{slug}":
+                f"<html><head><script>track('{slug}-session')</script>"
+                f"<style>.ad-{slug} {{}}</style></head>"
+                "<body><article><p>Same article text</p></article></body></html>"
+            for slug in ("a", "b")
+        }
+        monkeypatch.setattr(crawler, "_fetch_page", pages.get)
+        monkeypatch.setattr(crawler, "_is_safe_url", lambda url: True)
+        monkeypatch.setattr(crawler, "_wait_for_host", lambda url: None)
+
+        crawled = [crawler._crawl_one({"url": url}) for url in pages]
+
+        assert crawled[0]["content"] == "Same article text"
+        assert crawled[1] is None
+
+
+class TestSession:
+    def test_fetch_reuses_pooled_session(self, crawler, monkeypatch):
+        response = _response(b"<p>ok</p>")
+        get = MagicMock(return_value=response)
+        monkeypatch.setattr(crawler._session, "get", get)
+
+        crawler._fetch_page("https://example.com/a")
+        crawler._fetch_page("https://example.com/b")
+
+        assert get.call_count == 2
+        assert crawler._session.headers["User-Agent"] == crawler.user_agent
+
+
+class TestFetchPage:
+    def _fetch(self, crawler, monkeypatch, response):
+        monkeypatch.setattr(crawler._session, "get", MagicMock(return_value=response))
+        return crawler._fetch_page("https://example.com/a")
+
+    def test_returns_html(self, crawler, monkeypatch):
+        assert self._fetch(crawler, monkeypatch, _response(b"<p>ok</p>")) == "<p>ok</p>"
+
+    def test_skips_non_html(self, crawler, monkeypatch):
+        response = _response(b"%PDF-1.7", "application/pdf")
+        assert self._fetch(crawler, monkeypatch, response) is None
+
+    def test_skips_oversized_body(self, crawler, monkeypatch):
+        from src.crawl.crawler import MAX_RESPONSE_BYTES
+        response = _response(b"x" * (MAX_RESPONSE_BYTES + 1))
+        assert self._fetch(crawler, monkeypatch, response) is None
+
+
+class TestRedirectCache:
+    def test_preloaded_redirect_skips_head(self, crawler, monkeypatch):
+        head = MagicMock()
+        monkeypatch.setattr(crawler._session, "head", head)
+        crawler.preload_redirects({"https://t.co/abc": "https://example.com/story"})
+
+        assert crawler.resolve_redirect("https://t.co/abc") == "https://example.com/story"
+        head.assert_not_called()
+        assert crawler.pop_new_redirects() == {}
+
+    def test_new_resolutions_are_reported_once(self, crawler, monkeypatch):
+        head = MagicMock(return_value=MagicMock(url="https://example.com/story"))
+        monkeypatch.setattr(crawler._session, "head", head)
+        monkeypatch.setattr(crawler, "_is_safe_url", lambda url: True)
+
+        crawler.resolve_redirect("https://t.co/abc")
+        crawler.resolve_redirect("https://t.co/abc")
+
+        assert head.call_count == 1
+        assert crawler.pop_new_redirects() == {"https://t.co/abc": "https://example.com/story"}
+        assert crawler.pop_new_redirects() == {}
+
+    def test_non_redirects_and_errors_are_not_cached(self, crawler, monkeypatch):
+        responses = {
+            "https://example.com/direct": MagicMock(url="https://example.com/direct", ok=True),
+            "https://t.co/blocked": MagicMock(url="https://example.com/b", ok=False),
+        }
+        monkeypatch.setattr(crawler._session, "head", lambda url, **kw: responses[url])
+        monkeypatch.setattr(crawler, "_is_safe_url", lambda url: True)
+
+        for url in responses:
+            crawler.resolve_redirect(url)
+
+        assert crawler.pop_new_redirects() == {}
+
+
+class TestResolveRedirect:
+    def test_heads_to_one_host_are_capped(self, crawler, monkeypatch):
+        import threading
+        import time
+        from src.crawl.crawler import MAX_HEADS_PER_HOST
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def head(url, **kwargs):
+            with lock:
+                active.append(url)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(url)
+            return MagicMock(url=url, ok=True)
+
+        monkeypatch.setattr(crawler._session, "head", head)
+        monkeypatch.setattr(crawler, "_is_safe_url", lambda url: True)
+
+        crawler.get_content_urls([f"https://click.example.com/track/{i}" for i in range(8)])
+
+        assert len(peak) == 8
+        assert max(peak) == MAX_HEADS_PER_HOST
+
+    def test_short_path_on_tracking_domain_is_skipped(self, crawler, monkeypatch):
+        head = MagicMock()
+        monkeypatch.setattr(crawler._session, "head", head)
+        assert crawler.resolve_redirect("https://link.mail.beehiiv.com/ab") is None
+        head.assert_not_called()
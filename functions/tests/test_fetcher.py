@@ -5,38 +5,260 @@ Origin: production crash `AttributeError: 'int' object has no attribute
 entry instead of a (envelope, body) tuple.
 """
 
-from src.mail_handling.fetcher import _extract_rfc822_bytes
+from unittest.mock import MagicMock
 
+from src.mail_handling.fetcher import FETCH_BATCH_SIZE, _extract_fetch_bodies
 
-class TestExtractRfc822Bytes:
+
+class TestExtractFetchBodies:
     def test_normal_tuple_shape(self):
         """Standard imaplib response: [(envelope, body), closing_paren]."""
         body = b"From: a@b.com\r\nSubject: hi\r\n\r\nHello"
         msg_data = [(b"1 (RFC822 {36}", body), b")"]
-        assert _extract_rfc822_bytes(msg_data) == body
+        assert _extract_fetch_bodies(msg_data) == {b"1": body}
+
+    def test_multi_message_response(self):
+        msg_data = [(b"1 (RFC822 {3}", b"one"), b")", (b"2 (RFC822 {3}", b"two"), b")"]
+        assert _extract_fetch_bodies(msg_data) == {b"1": b"one", b"2": b"two"}
 
-    def test_bytes_only_response_returns_none(self):
+    def test_bytes_only_response_is_skipped(self):
         """Edge case that caused the production crash."""
         msg_data = [b"1 (UID 123 RFC822 {0} )"]
-        assert _extract_rfc822_bytes(msg_data) is None
+        assert _extract_fetch_bodies(msg_data) == {}
 
     def test_mixed_response_picks_tuple(self):
         """Some responses have flag updates interleaved with the body."""
         body = b"real message body"
         msg_data = [b"1 FETCH (FLAGS (\\Seen))", (b"1 (RFC822 {17}", body)]
-        assert _extract_rfc822_bytes(msg_data) == body
+        assert _extract_fetch_bodies(msg_data) == {b"1": body}
 
-    def test_empty_response_returns_none(self):
-        assert _extract_rfc822_bytes([]) is None
-        assert _extract_rfc822_bytes(None) is None
+    def test_empty_response(self):
+        assert _extract_fetch_bodies([]) == {}
+        assert _extract_fetch_bodies(None) == {}
 
-    def test_tuple_with_non_bytes_body_returns_none(self):
+    def test_tuple_with_non_bytes_body_is_skipped(self):
         msg_data = [(b"1 (RFC822 {0}", None)]
-        assert _extract_rfc822_bytes(msg_data) is None
+        assert _extract_fetch_bodies(msg_data) == {}
 
     def test_bytearray_body_is_accepted(self):
         body = bytearray(b"bytearray body")
         msg_data = [(b"1 (RFC822 {14}", body)]
-        result = _extract_rfc822_bytes(msg_data)
+        result = _extract_fetch_bodies(msg_data)[b"1"]
         assert result == bytes(body)
         assert isinstance(result, bytes)
+
+
+def _raw_email(message_id, subject="Hello"):
+    return (
+        f"Message-ID: {message_id}\r\nSubject: {subject}\r\nFrom: a@b.com\r\n"
+        "Content-Type: text/plain\r\n\r\nBody text"
+    ).encode()
+
+
+class FakeImap:
+    """Minimal imaplib stand-in serving a fixed mailbox."""
+
+    def __init__(self, messages):
+        self.messages = messages  # {b"id": raw bytes}
+        self.fetch_calls = []
+
+    def select(self, folder):
+        return "OK", [b"1"]
+
+    def search(self, charset, criterion):
+        return "OK", [b" ".join(self.messages)]
+
+    def fetch(self, ids, spec):
+        self.fetch_calls.append((ids, spec))
+        response = []
+        for msg_id in ids.split(b","):
+            body = self.messages[msg_id]
+            if b"HEADER.FIELDS" in spec.encode():
+                body = body.split(b"\r\n", 1)[0] + b"\r\n\r\n"
+            response += [(b"%s (RFC822 {0}" % msg_id, body), b")"]
+        return "OK", response
+
+    def noop(self):
+        return "OK", []
+
+    def close(self):
+        pass
+
+    def logout(self):
+        pass
+
+
+EMAIL_CONFIG = {
+    "fetch_email": "me@x", "password": "pw", "imap_server": "imap.x",
+    "imap_port": 993, "folders": ["INBOX"], "initial_lookback_days": 1,
+}
+
+
+class TestFetchNewEmails:
+    def _fetcher(self, monkeypatch, mail):
+        from src.mail_handling.fetcher import EmailFetcher
+        fetcher = EmailFetcher(EMAIL_CONFIG)
+        monkeypatch.setattr(fetcher, "connect", lambda: mail)
+        return fetcher
+
+    def test_skips_seen_message_ids(self, monkeypatch):
+        mail = FakeImap({b"1": _raw_email("<a@x>"), b"2": _raw_email("<b@x>")})
+        seen = {"<a@x>"}
+
+        emails = self._fetcher(monkeypatch, mail).fetch_new_emails(seen_message_ids=seen)
+
+        assert [e["message_id"] for e in emails] == ["<b@x>"]
+        assert seen == {"<a@x>", "<b@x>"}
+        assert mail.fetch_calls[-1] == (b"2", "(RFC822)")
+
+    def test_failed_header_fetch_falls_back_to_full_fetch(self, monkeypatch):
+        import imaplib
+        mail = FakeImap({b"1": _raw_email("<a@x>"), b"2": _raw_email("<b@x>")})
+        fetch = mail.fetch
+
+        def flaky_fetch(ids, spec):
+            if "HEADER.FIELDS" in spec:
+                raise imaplib.IMAP4.error("FETCH failed")
+            return fetch(ids, spec)
+
+        mail.fetch = flaky_fetch
+
+        emails = self._fetcher(monkeypatch, mail).fetch_new_emails(seen_message_ids={"<a@x>"})
+
+        assert [e["message_id"] for e in emails] == ["<b@x>"]
+
+    def test_fetches_in_batches(self, monkeypatch):
+        count = FETCH_BATCH_SIZE + 1
+        mail = FakeImap({str(i).encode(): _raw_email(f"<{i}@x>") for i in range(count)})
+
+        emails = self._fetcher(monkeypatch, mail).fetch_new_emails()
+
+        assert len(emails) == count
+        body_fetches = [c for c in mail.fetch_calls if c[1] == "(RFC822)"]
+        assert len(body_fetches) == 2
+
+    def test_failed_chunk_keeps_emails_already_fetched(self, monkeypatch):
+        import imaplib
+        count = FETCH_BATCH_SIZE + 1
+        mail = FakeImap({str(i).encode(): _raw_email(f"<{i}@x>") for i in range(count)})
+        fetch = mail.fetch
+
+        def flaky_fetch(ids, spec):
+            if spec == "(RFC822)" and mail.fetch_calls[-1][1] == "(RFC822)":
+                raise imaplib.IMAP4.abort("connection dropped")
+            return fetch(ids, spec)
+
+        mail.fetch = flaky_fetch
+
+        emails = self._fetcher(monkeypatch, mail).fetch_new_emails()
+
+        assert len(emails) == FETCH_BATCH_SIZE
+
+
+class TestGetEmailContent:
+    def _content(self, msg):
+        from src.mail_handling.fetcher import EmailFetcher
+        return EmailFetcher(EMAIL_CONFIG)._get_email_content(msg)
+
+    def test_attachment_is_not_decoded(self):
+        from email.mime.application import MIMEApplication
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
+        msg = MIMEMultipart()
+        msg.attach(MIMEText("<p>newsletter</p>", "html"))
+        attachment = MIMEApplication(b"\x00" * 1024, Name="report.pdf")
+        attachment["Content-Disposition"] = 'attachment; filename="report.pdf"'
+        msg.attach(attachment)
+
+        content = self._content(msg)
+
+        assert content["html"] == "<p>newsletter</p>"
+        assert content["attachments"] == [
+            {"filename": "report.pdf", "content_type": "application/octet-stream"}
+        ]
+
+    def test_largest_alternative_wins(self):
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
+        msg = MIMEMultipart("alternative")
+        msg.attach(MIMEText("<p>short</p>", "html"))
+        msg.attach(MIMEText("<p>the longer café copy</p>", "html", "utf-8"))
+        msg.attach(MIMEText("plain", "plain"))
+
+        content = self._content(msg)
+
+        assert content["html"] == "<p>the longer café copy</p>"
+        assert content["text"] == "plain"
+        assert "raw_message" not in content
+
+    def test_attached_message_is_not_searched(self):
+        from email.mime.message import MIMEMessage
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+
+        inner = MIMEMultipart()
+        inner.attach(MIMEText("<p>an old, much longer attached newsletter</p>", "html"))
+        attached = MIMEMessage(inner)
+        attached["Content-Disposition"] = "attachment"
+        outer = MIMEMultipart()
+        outer.attach(MIMEText("<p>cover note</p>", "html"))
+        outer.attach(attached)
+
+        assert self._content(outer)["html"] == "<p>cover note</p>"
+
+    def test_declared_charset_is_honoured(self):
+        from email.mime.text import MIMEText
+
+        msg = MIMEText("<p>Déjà vu, señor</p>", "html", "iso-8859-15")
+
+        assert self._content(msg)["html"] == "<p>Déjà vu, señor</p>"
+
+    def test_undeclared_non_utf8_body_is_detected(self):
+        from src.mail_handling.fetcher import _decode_payload
+        body = (
+            "Le café de la façade est très apprécié. Les élèves étudient à "
+            "l'école et préfèrent les crêpes. Où est la bibliothèque? "
+        ) * 3
+        assert _decode_payload(body.encode("cp1252"), None) == body
+
+
+class TestDecodeHeader:
+    def test_plain_ascii_is_returned_as_is(self):
+        from src.mail_handling.fetcher import EmailFetcher
+        assert EmailFetcher(EMAIL_CONFIG)._decode_header("Weekly digest") == "Weekly digest"
+
+    def test_encoded_word_is_decoded_and_cached(self):
+        from src.mail_handling.fetcher import EmailFetcher, _decode_header_cached
+        header = "=?utf-8?q?Caf=C3=A9_news?="
+        fetcher = EmailFetcher(EMAIL_CONFIG)
+        hits = _decode_header_cached.cache_info().hits
+
+        assert fetcher._decode_header(header) == "Café news"
+        assert fetcher._decode_header(header) == "Café news"
+        assert _decode_header_cached.cache_info().hits > hits
+
+
+class TestConnect:
+    def test_retries_with_jittered_backoff(self, monkeypatch):
+        from src.mail_handling import fetcher as fetcher_mod
+
+        attempts = []
+
+        def flaky_imap(*args, **kwargs):
+            attempts.append(args)
+            if len(attempts) < 3:
+                raise OSError("connection reset")
+            return MagicMock()
+
+        sleeps = []
+        monkeypatch.setattr(fetcher_mod.imaplib, "IMAP4_SSL", flaky_imap)
+        monkeypatch.setattr(fetcher_mod.time, "sleep", sleeps.append)
+
+        fetcher_mod.EmailFetcher(EMAIL_CONFIG).connect()
+
+        base = fetcher_mod.INITIAL_RETRY_DELAY_SECONDS
+        assert len(sleeps) == 2
+        assert 0.5 * base <= sleeps[0] <= 1.5 * base
+        assert 0.75 * base <= sleeps[1] <= 2.25 * base
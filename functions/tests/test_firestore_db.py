@@ -0,0 +1,219 @@
+"""Smoke tests: verify Firestore access helpers batch their queries and writes."""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+FIREBASE_MOCKS = {
+    "firebase_admin": MagicMock(),
+    "firebase_admin.auth": MagicMock(),
+    "firebase_admin.firestore": MagicMock(),
+    "firebase_functions": MagicMock(),
+    "firebase_functions.https_fn": MagicMock(),
+    "firebase_functions.options": MagicMock(),
+    "google.cloud.secretmanager": MagicMock(),
+    "google.cloud": MagicMock(),
+}
+
+
+@pytest.fixture(autouse=True)
+def _patch_firebase(monkeypatch):
+    for mod_name, mock in FIREBASE_MOCKS.items():
+        monkeypatch.setitem(__import__("sys").modules, mod_name, mock)
+
+
+@pytest.fixture()
+def db(monkeypatch):
+    from src import firestore_db
+    client = MagicMock()
+    monkeypatch.setattr(firestore_db, "_db", client)
+    return client
+
+
+def _doc(data):
+    doc = MagicMock()
+    doc.to_dict.return_value = data
+    return doc
+
+
+class TestGetCrawledUrls:
+    def test_chunks_in_queries(self, db):
+        from src.firestore_db import get_crawled_urls, url_hash, FIRESTORE_IN_QUERY_LIMIT
+        query = db.collection.return_value.where.return_value.where.return_value
+        query.get.return_value = [
+            _doc({"normalized_url": "https://example.com/0",
+                  "url_hash": url_hash("https://example.com/0")}),
+            # Same hash but a different URL: a collision, not a match.
+            _doc({"normalized_url": "https://other.com/",
+                  "url_hash": url_hash("https://example.com/1")}),
+        ]
+
+        urls = [f"https://example.com/{i}" for i in range(FIRESTORE_IN_QUERY_LIMIT + 5)]
+        result = get_crawled_urls(urls)
+
+        assert result == {"https://example.com/0"}
+        assert query.get.call_count == 2
+
+    def test_empty_input_skips_query(self, db):
+        from src.firestore_db import get_crawled_urls
+        assert get_crawled_urls([]) == set()
+        db.collection.return_value.where.assert_not_called()
+
+
+class TestStoreEmail:
+    def _store(self, links):
+        from src.firestore_db import store_email
+        return store_email("<m@x>", "Subject", "a@x", None, "html", "<p>body</p>", links)
+
+    def test_single_batch_commit(self, db):
+        refs = [MagicMock(id=f"doc{i}") for i in range(4)]
+        db.collection.return_value.document.side_effect = [MagicMock()] + refs
+
+        links = [{"url": f"https://example.com/{i}", "title": "t",
+                  "normalized_url": f"https://example.com/{i}"} for i in range(3)]
+        content_id, link_ids = self._store(links)
+
+        assert content_id == "doc0"
+        assert link_ids == {f"https://example.com/{i}": f"doc{i + 1}" for i in range(3)}
+        batch = db.batch.return_value
+        assert batch.set.call_count == 5
+        batch.commit.assert_called_once()
+
+    def test_commits_every_batch_limit_writes(self, db):
+        from src.firestore_db import FIRESTORE_BATCH_LIMIT
+        links = [{"url": f"https://example.com/{i}"}
+                 for i in range(FIRESTORE_BATCH_LIMIT)]
+        self._store(links)
+        assert db.batch.return_value.commit.call_count == 2
+
+
+class TestGetResolvedRedirects:
+    def test_single_get_all_and_ttl(self, db):
+        from src.firestore_db import get_resolved_redirects
+        now = datetime.now(timezone.utc)
+        fresh = _doc({"url": "https://t.co/a", "resolved_url": "https://example.com/a",
+                      "resolved_at": now})
+        stale = _doc({"url": "https://t.co/b", "resolved_url": "https://example.com/b",
+                      "resolved_at": now - timedelta(days=30)})
+        missing = MagicMock(exists=False)
+        db.get_all.return_value = [fresh, stale, missing]
+
+        result = get_resolved_redirects(["https://t.co/a", "https://t.co/b", "https://t.co/c"])
+
+        assert result == {"https://t.co/a": "https://example.com/a"}
+        db.get_all.assert_called_once()
+
+
+class TestGetProcessedEmailIds:
+    def test_single_get_all(self, db):
+        from src.firestore_db import get_processed_email_ids
+        seen = MagicMock(id="<a@x>", exists=True)
+        unseen = MagicMock(id="<b@x>", exists=False)
+        db.get_all.return_value = [seen, unseen]
+
+        result = get_processed_email_ids(["<a@x>", "<b@x>", "", "<a@x>"])
+
+        assert result == {"<a@x>"}
+        db.get_all.assert_called_once()
+        assert len(db.get_all.call_args[0][0]) == 2
+
+
+class TestMarkContentSummarized:
+    def test_splits_at_batch_limit(self, db):
+        from src.firestore_db import mark_content_summarized, FIRESTORE_BATCH_LIMIT
+        ids = [f"doc{i}" for i in range(FIRESTORE_BATCH_LIMIT * 2 + 1)]
+        mark_content_summarized(ids, "summary1")
+        assert db.batch.return_value.commit.call_count == 3
+
+
+class TestMarkLinksCrawled:
+    def test_only_updates_link_docs(self, db):
+        from src.firestore_db import mark_links_crawled
+        mark_links_crawled(["l1", "l2"])
+        batch = db.batch.return_value
+        assert batch.update.call_count == 2
+        batch.set.assert_not_called()
+        batch.commit.assert_called_once()
+
+
+class TestPackText:
+    def test_short_text_is_stored_as_is(self):
+        from src.firestore_db import pack_text
+        assert pack_text("short") == "short"
+
+    def test_long_text_round_trips_compressed(self):
+        from src.firestore_db import pack_text, unpack_text, COMPRESS_MIN_CHARS
+        text = "newsletter body " * COMPRESS_MIN_CHARS
+        packed = pack_text(text)
+        assert isinstance(packed, bytes)
+        assert len(packed) < len(text)
+        assert unpack_text(packed) == text
+
+    def test_unpack_accepts_legacy_strings(self):
+        from src.firestore_db import unpack_text
+        assert unpack_text("plain") == "plain"
+        assert unpack_text(None) == ""
+
+
+class TestGetExistingContentHashes:
+    def test_chunks_in_queries_and_caches_hits(self, db, monkeypatch):
+        from src import firestore_db
+        monkeypatch.setattr(firestore_db, "_known_content_hashes", OrderedDict())
+        query = db.collection.return_value.where.return_value.select.return_value
+        query.get.return_value = [_doc({"content_hash": b"0" * 16})]
+
+        hashes = [str(i).encode().rjust(16, b"0")
+                  for i in range(firestore_db.FIRESTORE_IN_QUERY_LIMIT + 5)]
+        assert firestore_db.get_existing_content_hashes(hashes) == {b"0" * 16}
+        assert query.get.call_count == 2
+
+        assert firestore_db.get_existing_content_hashes([b"0" * 16]) == {b"0" * 16}
+        assert query.get.call_count == 2
+
+    def test_stored_hash_skips_query(self, db, monkeypatch):
+        from src import firestore_db
+        monkeypatch.setattr(firestore_db, "_known_content_hashes", OrderedDict())
+        db.collection.return_value.add.return_value = (None, MagicMock(id="pc1"))
+
+        firestore_db.store_processed_content("<m@x>", "s", "html", {}, b"k" * 16)
+
+        assert firestore_db.get_existing_content_hashes([b"k" * 16]) == {b"k" * 16}
+        db.collection.return_value.where.assert_not_called()
+
+    def test_cache_evicts_least_recently_seen(self, db, monkeypatch):
+        from src import firestore_db
+        monkeypatch.setattr(firestore_db, "_known_content_hashes", OrderedDict())
+        monkeypatch.setattr(firestore_db, "KNOWN_CONTENT_HASHES_MAX", 2)
+
+        firestore_db._remember_content_hashes([b"a", b"b"])
+        firestore_db._remember_content_hashes([b"a", b"c"])
+
+        assert list(firestore_db._known_content_hashes) == [b"a", b"c"]
+
+
+class TestProcessedContentCompression:
+    def test_texts_round_trip_through_store_and_read(self, db):
+        from src.firestore_db import (
+            COMPRESS_MIN_CHARS, get_unsummarized_content, store_processed_content,
+        )
+        body = "newsletter body " * COMPRESS_MIN_CHARS
+        structure = {"source": "Weekly", "content": body,
+                     "articles": [{"title": "A", "url": "u", "content": body}]}
+        collection = db.collection.return_value
+        collection.add.return_value = (None, MagicMock(id="pc1"))
+
+        store_processed_content("<m@x>", "Weekly", "html", structure, b"h" * 16)
+
+        stored = collection.add.call_args[0][0]["processed_content"]
+        assert isinstance(stored["content"], bytes)
+        assert isinstance(stored["articles"][0]["content"], bytes)
+        assert structure["content"] == body
+
+        doc = _doc({"processed_content": stored})
+        doc.id = "pc1"
+        collection.where.return_value.order_by.return_value.get.return_value = [doc]
+        [item] = get_unsummarized_content()
+        assert item["processed_content"]["content"] == body
+        assert item["processed_content"]["articles"][0]["content"] == body
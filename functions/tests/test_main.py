@@ -0,0 +1,89 @@
+"""Smoke tests: verify fetch_and_process skips work for duplicate content."""
+
+import sys
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+
+class _Response:
+    def __init__(self, body, **kwargs):
+        self.body = body
+
+
+@pytest.fixture()
+def main(monkeypatch):
+    https_fn = MagicMock()
+    https_fn.on_request = lambda **kwargs: (lambda func: func)
+    https_fn.Response = _Response
+    firebase_functions = MagicMock(https_fn=https_fn)
+    for mod_name, mock in {
+        "firebase_admin": MagicMock(),
+        "firebase_admin.auth": MagicMock(),
+        "firebase_admin.firestore": MagicMock(),
+        "firebase_functions": firebase_functions,
+        "firebase_functions.https_fn": https_fn,
+        "firebase_functions.options": MagicMock(),
+        "google.cloud.secretmanager": MagicMock(),
+        "google.cloud": MagicMock(),
+    }.items():
+        monkeypatch.setitem(sys.modules, mod_name, mock)
+    monkeypatch.delitem(sys.modules, "main", raising=False)
+    import main
+    return main
+
+
+def _email(message_id):
+    return {"message_id": message_id, "subject": "Weekly", "sender": "a@x",
+            "date": datetime.now(timezone.utc)}
+
+
+class TestFetchAndProcess:
+    def _run(self, main, monkeypatch, emails, known_hashes):
+        db = MagicMock()
+        db.get_recent_processed_email_ids.return_value = set()
+        db.get_processed_email_ids.return_value = set()
+        db.get_existing_content_hashes.return_value = known_hashes
+        db.get_crawled_urls.return_value = set()
+        db.store_email.return_value = ("c1", {})
+        fetcher = MagicMock()
+        fetcher.fetch_new_emails.return_value = emails
+        parser = MagicMock()
+        parser.parse.return_value = {
+            "content": "Newsletter body", "content_type": "text",
+            "links": [{"url": "https://example.com/story", "title": "Story"}],
+        }
+        crawler = MagicMock()
+        crawler.crawl.return_value = []
+        crawler.pop_new_redirects.return_value = {}
+
+        monkeypatch.setattr(main, "load_config", lambda: {
+            "email": {"initial_lookback_days": 1}, "content": {}})
+        monkeypatch.setattr(main, "firestore_db", db)
+        monkeypatch.setattr(main, "EmailFetcher", lambda config: fetcher)
+        monkeypatch.setattr(main, "EmailParser", lambda: parser)
+        monkeypatch.setattr(main, "WebCrawler", lambda config: crawler)
+
+        response = main.fetch_and_process(MagicMock())
+        return response, db, crawler
+
+    def test_duplicate_hash_is_recorded_but_not_crawled(self, main, monkeypatch):
+        content_hash = main._generate_content_hash("Weekly", "Newsletter body")
+
+        response, db, crawler = self._run(
+            main, monkeypatch, [_email("<a@x>")], {content_hash})
+
+        assert response.body == '{"processed": 0}'
+        db.store_email.assert_called_once()
+        assert db.store_email.call_args.kwargs["links"] == []
+        crawler.crawl.assert_not_called()
+        db.get_crawled_urls.assert_not_called()
+        db.store_processed_content.assert_not_called()
+
+    def test_new_content_is_crawled_and_stored(self, main, monkeypatch):
+        response, db, crawler = self._run(main, monkeypatch, [_email("<a@x>")], set())
+
+        assert response.body == '{"processed": 1}'
+        crawler.crawl.assert_called_once()
+        db.store_processed_content.assert_called_once()
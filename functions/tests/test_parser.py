@@ -0,0 +1,52 @@
+"""Smoke tests: verify EmailParser link extraction and HTML cleaning."""
+
+from src.mail_handling.parser import EmailParser
+
+
+class TestExtractLinks:
+    def test_html_links_are_deduplicated_with_titles(self):
+        html = (
+            '<html><body><p><a href="https://example.com/a"> Read <b>more</b> </a></p>'
+            '<a href="https://example.com/a">dup</a>'
+            '<a href="https://example.com/b" title="Fallback"></a>'
+            '<a href="mailto:x@example.com">mail</a><a>no href</a></body></html>'
+        )
+
+        links = EmailParser().extract_links(html, 'html')
+
+        assert [(link['url'], link['title']) for link in links] == [
+            ("https://example.com/a", "Readmore"),
+            ("https://example.com/b", "Fallback"),
+        ]
+
+    def test_text_links_use_regex(self):
+        links = EmailParser().extract_links("See https://example.com/x, and www.example.org.", 'text')
+        assert [link['url'] for link in links] == ["https://example.com/x", "http://www.example.org"]
+
+    def test_text_without_urls(self):
+        assert EmailParser().extract_links("No links in this plain text body.", 'text') == []
+
+
+class TestCleanHtml:
+    def test_strips_scripts_and_footers(self):
+        html = (
+            '<html><body><script>x()</script><p>Story</p>'
+            '<div class="email-footer">Unsubscribe</div></body></html>'
+        )
+        cleaned = EmailParser()._clean_html(html)
+        assert "Story" in cleaned
+        assert "x()" not in cleaned
+        assert "Unsubscribe" not in cleaned
+
+
+class TestIsValidUrl:
+    def test_accepts_http_urls_with_a_host(self):
+        parser = EmailParser()
+        for url in ("https://example.com", "HTTP://EXAMPLE.COM/a", "www.example.com"):
+            assert parser._is_valid_url(url), url
+
+    def test_rejects_other_schemes_and_empty_hosts(self):
+        parser = EmailParser()
+        for url in ("", "mailto:a@b.com", "ftp://x", "http:///path", "https://", "/relative", "#top",
+                    "http://[broken/x", "https://[::1", "http://a]b/", "http://\t/"):
+            assert not parser._is_valid_url(url), url
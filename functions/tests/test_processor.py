@@ -0,0 +1,28 @@
+"""Smoke tests: verify cross-summary deduplication in ContentProcessor."""
+
+from src.summarize.processor import ContentProcessor
+
+BODY = (
+    "Researchers released a new open model that beats last year's results on "
+    "every reasoning benchmark while using a fraction of the training compute. "
+) * 8
+
+
+def _history(fingerprint):
+    return [{"content_hash": "", "content_title": "", "content_fingerprint": fingerprint}]
+
+
+class TestFilterWithHistory:
+    def test_near_duplicate_body_is_skipped(self, mock_content_config):
+        processor = ContentProcessor(mock_content_config)
+        item = {"source": "Weekly", "content": BODY}
+        fingerprint = processor._extract_meaningful_fingerprint(BODY)
+
+        assert processor.filter_with_history([item], _history(fingerprint + " Extra.")) == []
+
+    def test_unrelated_body_is_kept(self, mock_content_config):
+        processor = ContentProcessor(mock_content_config)
+        item = {"source": "Weekly", "content": BODY}
+
+        history = _history("Markets closed lower on Friday after a volatile week. " * 8)
+        assert processor.filter_with_history([item], history) == [item]
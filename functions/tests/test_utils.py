@@ -25,11 +25,11 @@ def _patch_firebase(monkeypatch):
 # --- _generate_content_hash ---
 
 class TestGenerateContentHash:
-    def test_returns_hex_string(self):
+    def test_returns_raw_digest(self):
         from main import _generate_content_hash
         result = _generate_content_hash("Test Subject", "Some content")
-        assert isinstance(result, str)
-        assert len(result) == 64  # SHA-256 hex digest length
+        assert isinstance(result, bytes)
+        assert len(result) == 16  # 128-bit BLAKE2b digest
 
     def test_deterministic(self):
         from main import _generate_content_hash